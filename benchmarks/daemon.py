@@ -0,0 +1,116 @@
+# Scripted clients against the local daemon, backed by the Ollama stub.
+# Chat clients and tool-command clients run concurrently; one chat client
+# disconnects mid-reply to check its LLM slot is given back. The daemon
+# keeps its default worker counts, so a tool command stuck behind waiting
+# chats shows up in the tool latency. Reports reply latency per kind and the
+# LLM queue as seen at the end.
+#
+#   python -m benchmarks.daemon --chats 6 --tools 20 --json daemon.json
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from core import config
+from benchmarks.pipeline import summarize
+
+
+def run_client(socket_path, commands, kind, results, lock, abandon_after=None):
+    from core.server import TovaClient
+    client = TovaClient(socket_path, timeout=60)
+    try:
+        for command in commands:
+            start = time.perf_counter()
+            if abandon_after is not None:
+                # Read a few tokens, then hang up without cancelling
+                client._send({"id": 1, "command": command})
+                for _ in range(abandon_after):
+                    client._recv()
+                kind = 'abandoned'
+            else:
+                first = []
+                client.ask(command, on_token=lambda t: first or first.append(time.perf_counter()))
+            elapsed = time.perf_counter() - start
+            with lock:
+                results.setdefault(kind, []).append(elapsed)
+                if abandon_after is None and first:
+                    results.setdefault(kind + '_first_token', []).append(first[0] - start)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exercise the TOVA daemon with concurrent scripted clients")
+    parser.add_argument('--chats', type=int, default=4, help="Concurrent chat clients")
+    parser.add_argument('--tools', type=int, default=8, help="Concurrent tool-command clients")
+    parser.add_argument('--rounds', type=int, default=3, help="Commands per client")
+    parser.add_argument('--chat-command', default="hello, tell me something interesting")
+    parser.add_argument('--tool-command', default="what time is it")
+    parser.add_argument('--concurrency', type=int, default=1, help="LLM_CONCURRENCY for the run")
+    parser.add_argument('--first-token-delay', type=float, default=0.2)
+    parser.add_argument('--token-delay', type=float, default=0.02)
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='tova-daemon-')
+    config.MEMORY_PATH = os.path.join(workdir, 'memory.json')
+    config.LOGS_PATH = os.path.join(workdir, 'logs')
+    config.CACHE_PATH = os.path.join(workdir, 'cache')
+    config.HISTORY_ENABLED = False
+    config.RESPONSE_CACHE_PERSIST = False
+    config.METRICS_SAMPLER = False
+    config.LLM_CONCURRENCY = args.concurrency
+    socket_path = os.path.join(workdir, 'tova.sock')
+
+    from benchmarks.ollama_stub import OllamaStub
+    from core.engine import TovaEngine
+    from core.server import TovaServer, TovaClient
+    stub = OllamaStub(first_token_delay=args.first_token_delay, token_delay=args.token_delay).start()
+    config.OLLAMA_URL = stub.url
+    engine = TovaEngine()
+    engine.ollama.cache = None  # Every chat must reach the queue
+    server = TovaServer(engine, socket_path=socket_path)
+    server.serve_in_thread()
+    while not os.path.exists(socket_path):
+        time.sleep(0.01)
+
+    results, lock = {}, threading.Lock()
+    threads = [threading.Thread(target=run_client, args=(socket_path, [args.chat_command], 'chat', results, lock, 3))]
+    for i in range(args.chats):
+        threads.append(threading.Thread(target=run_client, args=(socket_path, [args.chat_command] * args.rounds, 'chat', results, lock)))
+    for i in range(args.tools):
+        threads.append(threading.Thread(target=run_client, args=(socket_path, [args.tool_command] * args.rounds, 'tool', results, lock)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    client = TovaClient(socket_path)
+    stats = client.stats()
+    client.close()
+    result = {
+        "options": {k: v for k, v in vars(args).items() if k != 'json'},
+        "wall_seconds": round(wall, 3),
+        "latency": {kind: summarize(values) for kind, values in results.items()},
+        "llm_requests": len(stub.requests),
+        "llm_aborted": stub.server.aborted,
+        "llm_queue": stats["llm_queue"],
+    }
+    server.stop()
+    engine.close()
+    stub.stop()
+
+    print(f"{'kind':<18} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for kind, s in result["latency"].items():
+        print(f"{kind:<18} {s['n']:>5} {s['p50_ms']:>10} {s['p95_ms']:>10} {s['max_ms']:>10}")
+    print(f"wall {result['wall_seconds']} s, {result['llm_requests']} LLM requests ({result['llm_aborted']} aborted), queue at end {result['llm_queue']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
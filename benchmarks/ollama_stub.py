@@ -0,0 +1,101 @@
+# Minimal stand-in for Ollama's /api/generate: streams a canned reply as
+# NDJSON, one token per line, with a configurable delay before the first
+# token and between tokens.
+#
+#   python -m benchmarks.ollama_stub --port 11434
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "Sure, here is a short answer. It has a couple of sentences so the speech pipeline has something to split."
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _chunk(self, obj):
+        line = (json.dumps(obj) + '\n').encode('utf-8')
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        server = self.server
+        server.requests.append(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            if body.get('prompt'):
+                time.sleep(server.first_token_delay)
+                for i, token in enumerate(server.reply.split(' ')):
+                    self._chunk({'model': body.get('model'), 'response': token if i == 0 else ' ' + token, 'done': False})
+                    time.sleep(server.token_delay)
+            context = list(body.get('context') or []) + [len(server.requests)]
+            self._chunk({'model': body.get('model'), 'response': '', 'done': True, 'context': context})
+            self.wfile.write(b'0\r\n\r\n')
+            self.wfile.flush()
+        except ConnectionError:
+            server.aborted += 1  # Client cancelled mid-reply
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients hanging up (cancelled requests, closed keep-alive pools)
+        # are expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class OllamaStub:
+    def __init__(self, host='127.0.0.1', port=0, reply=DEFAULT_REPLY, first_token_delay=0.05, token_delay=0.01):
+        self.server = _Server((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.reply = reply
+        self.server.first_token_delay = first_token_delay
+        self.server.token_delay = token_delay
+        self.server.requests = []
+        self.server.aborted = 0
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/api/generate'
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama /api/generate endpoint")
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--first-token-delay', type=float, default=0.05)
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    args = parser.parse_args()
+    stub = OllamaStub(port=args.port, first_token_delay=args.first_token_delay, token_delay=args.token_delay)
+    print(f"Ollama stub listening on {stub.url}")
+    stub.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+# End-to-end latency benchmark: recorded WAV -> VoiceListener recognition
+# -> TovaEngine.stream_command -> SpeechPipeline, without a microphone,
+# speakers or a real Ollama. Reports p50/p95 per stage plus CPU time and RSS,
+# and can write JSON so runs can be compared across commits.
+#
+#   python -m benchmarks.pipeline --wav-dir benchmarks/fixtures --json run.json
+#   python -m benchmarks.pipeline --commands commands.txt --repeat 5
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from core import config
+
+CHUNK_FRAMES = 8000
+SAMPLE_RATE = 16000
+TRAILING_SILENCE = b'\x00\x00' * SAMPLE_RATE  # 1 s, so Vosk finalizes the utterance
+
+
+class SinkTTS:
+    # Stands in for TextToSpeech. "null" renders nothing; "file" renders
+    # with the real backend and writes each sentence to out_dir instead of
+    # playing it.
+    def __init__(self, mode='null', out_dir=None):
+        self.mode = mode
+        self.out_dir = out_dir
+        self.speaking = False
+        self.real = None
+        self.first_audio = None
+        self.count = 0
+        if mode == 'file':
+            from voice.text_to_speech import get_tts
+            self.real = get_tts()
+            os.makedirs(out_dir, exist_ok=True)
+
+    def reset(self):
+        self.first_audio = None
+
+    def _mark(self):
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter()
+
+    def synthesize(self, text):
+        audio = self.real.synthesize(text) if self.real else b''
+        self._mark()
+        return audio or None
+
+    def play(self, audio):
+        self.count += 1
+        with open(os.path.join(self.out_dir, f'{self.count:05d}.wav'), 'wb') as f:
+            f.write(audio)
+
+    def speak(self, text):
+        self._mark()
+
+    def stop(self):
+        pass
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(values):
+    return {
+        "n": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+def read_wav(path):
+    with wave.open(path, 'rb') as wav:
+        if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16 kHz mono 16-bit PCM")
+        return wav.readframes(wav.getnframes())
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def rss_mb():
+    import psutil
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class Recognizer:
+    # Drives VoiceListener's recognition thread with audio from WAV files
+    def __init__(self):
+        from voice.voice_listener import VoiceListener
+        self.listener = VoiceListener()
+        self.listener.start_listening(capture=False)
+
+    def transcribe(self, audio, timeout=30):
+        start = time.perf_counter()
+        for i in range(0, len(audio), CHUNK_FRAMES * 2):
+            self.listener.feed(audio[i:i + CHUNK_FRAMES * 2], block=True)
+        for i in range(0, len(TRAILING_SILENCE), CHUNK_FRAMES * 2):
+            self.listener.feed(TRAILING_SILENCE[i:i + CHUNK_FRAMES * 2], block=True)
+        text = self.listener.commands.get(timeout=timeout)
+        return text, time.perf_counter() - start
+
+    def close(self):
+        self.listener.stop_listening()
+
+
+def run_command(engine, speech, sink, text):
+    sink.reset()
+    marks = {}
+    start = time.perf_counter()
+
+    def tokens():
+        for piece in engine.stream_command(text):
+            marks.setdefault('first_token', time.perf_counter())
+            yield piece
+        marks['engine'] = time.perf_counter()
+
+    speech.speak_stream(tokens())
+    end = time.perf_counter()
+    return {
+        "first_token": marks.get('first_token', end) - start,
+        "engine": marks.get('engine', end) - start,
+        "first_audio": (sink.first_audio or end) - start,
+        "pipeline": end - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ASR -> engine -> TTS latency")
+    parser.add_argument('--wav-dir', help="Directory of 16 kHz mono WAV fixtures")
+    parser.add_argument('--commands', help="Text file with one command per line (skips ASR)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tts', choices=['null', 'file'], default='null')
+    parser.add_argument('--ollama-url', help="Use this Ollama instead of the built-in stub")
+    parser.add_argument('--first-token-delay', type=float, default=0.05, help="Stub delay before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.01, help="Stub delay between tokens")
+    parser.add_argument('--cache', action='store_true', help="Keep the LLM response cache enabled")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+    if not args.wav_dir and not args.commands:
+        parser.error("give --wav-dir and/or --commands")
+
+    # Keep the user's memory, logs and caches out of it
+    workdir = tempfile.mkdtemp(prefix='tova-bench-')
+    config.MEMORY_PATH = os.path.join(workdir, 'memory.json')
+    config.LOGS_PATH = os.path.join(workdir, 'logs')
+    config.CACHE_PATH = os.path.join(workdir, 'cache')
+    config.HISTORY_PATH = os.path.join(workdir, 'history')
+    config.RESPONSE_CACHE_PERSIST = False
+
+    stub = None
+    if args.ollama_url:
+        config.OLLAMA_URL = args.ollama_url
+    else:
+        from benchmarks.ollama_stub import OllamaStub
+        stub = OllamaStub(first_token_delay=args.first_token_delay, token_delay=args.token_delay).start()
+        config.OLLAMA_URL = stub.url
+
+    from core.engine import TovaEngine
+    from voice.speech_pipeline import SpeechPipeline
+
+    usage_start = resource.getrusage(resource.RUSAGE_SELF)
+    rss_start = rss_mb()
+    timings = {}
+    samples = []
+
+    def record(stage, seconds):
+        timings.setdefault(stage, []).append(seconds)
+
+    started = time.perf_counter()
+    engine = TovaEngine()
+    record('engine_init', time.perf_counter() - started)
+    if not args.cache:
+        engine.ollama.cache = None
+    sink = SinkTTS(args.tts, os.path.join(workdir, 'tts'))
+    speech = SpeechPipeline(sink)
+
+    inputs = []
+    if args.commands:
+        with open(args.commands) as f:
+            inputs += [(None, line.strip()) for line in f if line.strip()]
+    recognizer = None
+    if args.wav_dir:
+        started = time.perf_counter()
+        recognizer = Recognizer()
+        record('asr_init', time.perf_counter() - started)
+        for name in sorted(os.listdir(args.wav_dir)):
+            if name.endswith('.wav'):
+                inputs.append((os.path.join(args.wav_dir, name), None))
+
+    for _ in range(args.repeat):
+        for wav_path, text in inputs:
+            sample = {"input": wav_path or text}
+            if wav_path:
+                text, seconds = recognizer.transcribe(read_wav(wav_path))
+                record('asr', seconds)
+                sample["transcript"] = text
+                sample["asr"] = seconds
+            stages = run_command(engine, speech, sink, text)
+            for stage, seconds in stages.items():
+                record(stage, seconds)
+            sample.update(stages)
+            samples.append(sample)
+
+    if recognizer:
+        recognizer.close()
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec='seconds'),
+        "python": sys.version.split()[0],
+        "threads": threading.active_count(),
+        "options": {k: v for k, v in vars(args).items() if k != 'json'},
+        "stages": {stage: summarize(values) for stage, values in timings.items()},
+        "cpu_seconds": round((usage_end.ru_utime - usage_start.ru_utime) + (usage_end.ru_stime - usage_start.ru_stime), 3),
+        "rss_mb": {"start": round(rss_start, 1), "end": round(rss_mb(), 1), "peak": round(usage_end.ru_maxrss / 1024, 1)},
+        "routes": engine.route_stats.summary(),
+        "samples": samples,
+    }
+    engine.close()
+    if stub:
+        stub.stop()
+
+    print(f"{'stage':<12} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for stage, s in result["stages"].items():
+        print(f"{stage:<12} {s['n']:>5} {s['p50_ms']:>10} {s['p95_ms']:>10} {s['max_ms']:>10}")
+    print(f"cpu {result['cpu_seconds']} s, rss {result['rss_mb']['end']} MB (peak {result['rss_mb']['peak']} MB)")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
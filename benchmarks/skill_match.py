@@ -0,0 +1,79 @@
+# Skill lookup latency: the old per-skill partial_ratio loop vs SkillIndex,
+# with and without the trigram prefilter. Also checks that the prefilter
+# picks the same skill as the full scan when the skill is said with words
+# around it, as people do ("could you quickly backup my photos for me").
+# Random word swaps are not checked: with this vocabulary the full scan's
+# best partial_ratio match for them is mostly an unrelated skill.
+#
+#   python -m benchmarks.skill_match
+import random
+import string
+import time
+from rapidfuzz import fuzz
+from core.skills import SkillIndex
+
+SIZES = [10, 1000, 50000]
+QUERIES = 50
+PADDING = ["could you quickly", "hey tova please", "i would like you to", "now", ""]
+TRAILING = ["for me", "please", "right now", "thanks", ""]
+WORDS = ["open", "run", "show", "check", "start", "stop", "my", "the", "server", "backup",
+         "music", "browser", "logs", "disk", "network", "project", "editor", "vpn", "mail", "notes"]
+
+
+def make_skills(n, rng):
+    skills = []
+    for i in range(n):
+        phrase = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5)))
+        tag = ''.join(rng.choice(string.ascii_lowercase) for _ in range(4))
+        skills.append({'input': f"{phrase} {tag}", 'action': f"action {i}"})
+    return skills
+
+
+def linear_match(skills, user_input, threshold=80):
+    best = None
+    best_score = 0
+    for skill in skills:
+        score = fuzz.partial_ratio(user_input.lower(), skill['input'].lower())
+        if score > best_score:
+            best = skill
+            best_score = score
+    if best and best_score >= threshold:
+        return best['action']
+    return None
+
+
+def spoken(skill, rng):
+    # The skill as someone might actually say it
+    return f"{rng.choice(PADDING)} {skill['input']} {rng.choice(TRAILING)}".strip()
+
+
+def check_prefilter(index, prefiltered, queries):
+    for q in queries:
+        expected, got = index.match(q), prefiltered.match(q)
+        assert got is expected, f"prefilter picked {got} instead of {expected} for {q!r}"
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'skills':>8} {'linear ms':>12} {'index ms':>12} {'prefilter ms':>14}")
+    for n in SIZES:
+        skills = make_skills(n, rng)
+        queries = [rng.choice(skills)['input'].upper() for _ in range(QUERIES)]
+        index = SkillIndex(skills)
+        prefiltered = SkillIndex(skills, prefilter_above=0)
+        linear = timed(lambda q: linear_match(skills, q), queries)
+        indexed = timed(lambda q: index.match(q), queries)
+        pre = timed(lambda q: prefiltered.match(q), queries)
+        check_prefilter(index, prefiltered, [spoken(rng.choice(skills), rng) for _ in range(QUERIES)])
+        print(f"{n:>8} {linear:>12.3f} {indexed:>12.3f} {pre:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import datetime
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from core import config
+
+SEGMENT = re.compile(r'^(\d{4}-\d{2}-\d{2})\.(\d{3})\.jsonl(\.gz)?$')
+
+
+class ActionLog:
+    # Commands and their results as JSON lines in memory/logs/. log() only
+    # appends to an in-memory buffer; a background thread writes it out every
+    # `flush_interval` seconds. Files are segments, one or more per day
+    # (a new one starts at `segment_bytes`), and finished segments are
+    # gzipped. index.json records each segment's first and last timestamp,
+    # so a date-range query only opens the segments that overlap it. With
+    # persist=False nothing is written or read and the log stays empty.
+    def __init__(self, path=None, flush_interval=None, segment_bytes=None, compress=None, persist=True):
+        self.path = path or config.LOGS_PATH
+        self.flush_interval = flush_interval or config.LOG_FLUSH_INTERVAL
+        self.segment_bytes = segment_bytes or config.LOG_SEGMENT_BYTES
+        self.compress = config.LOG_COMPRESS if compress is None else compress
+        self.index_path = os.path.join(self.path, 'index.json')
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._file = None
+        self.persist = persist
+        self.segments = []
+        self._thread = None
+        if persist:
+            os.makedirs(self.path, exist_ok=True)
+            self.segments = self._load_index()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    # Index
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                segments = json.load(f)
+        except (OSError, ValueError):
+            segments = []
+        # Reconcile with what is on disk: a crash can leave the index behind
+        # the last segment, and segments may have been compressed or deleted
+        known = {s['file'].removesuffix('.gz'): s for s in segments}
+        result = []
+        for name in sorted(os.listdir(self.path)):
+            m = SEGMENT.match(name)
+            if not m:
+                continue
+            full = os.path.join(self.path, name)
+            if not m.group(3) and os.path.exists(full + '.gz'):
+                os.remove(full)  # Compressed copy was complete; crashed before removing this
+                continue
+            seg = known.get(name.removesuffix('.gz'))
+            if seg is None or (not m.group(3) and seg['bytes'] != os.path.getsize(full)):
+                seg = self._scan(name, m.group(1))
+            seg['file'] = name
+            if m.group(3):
+                seg['closed'] = True
+            result.append(seg)
+        result.sort(key=lambda s: SEGMENT.match(s['file']).group(1, 2))
+        return result
+
+    def _scan(self, name, day):
+        seg = {'file': name, 'day': day, 'start': None, 'end': None, 'count': 0, 'bytes': 0, 'closed': False}
+        for record in self._read(seg):
+            seg['start'] = record['ts'] if seg['start'] is None else seg['start']
+            seg['end'] = record['ts']
+            seg['count'] += 1
+        if not name.endswith('.gz'):
+            seg['bytes'] = os.path.getsize(os.path.join(self.path, name))
+        return seg
+
+    def _save_index(self):
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.segments, f)
+        os.replace(tmp, self.index_path)
+
+    # Writing
+
+    def log(self, command, result):
+        if not self.persist:
+            return
+        record = {'ts': time.time(), 'command': command, 'result': result}
+        with self._lock:
+            self._buffer.append(record)
+            full = len(self._buffer) >= config.LOG_BUFFER_MAX
+        if full:
+            self._wake.set()
+
+    def _active(self, day, size):
+        seg = self.segments[-1] if self.segments else None
+        if seg is None or seg['closed'] or seg['day'] != day or (seg['count'] and seg['bytes'] + size > self.segment_bytes):
+            if self._file:
+                self._file.close()
+                self._file = None
+            if seg is not None:
+                seg['closed'] = True
+            n = sum(1 for s in self.segments if s['day'] == day)
+            seg = {'file': f'{day}.{n:03d}.jsonl', 'day': day, 'start': None, 'end': None, 'count': 0, 'bytes': 0, 'closed': False}
+            self.segments.append(seg)
+        if self._file is None:
+            self._file = open(os.path.join(self.path, seg['file']), 'a', encoding='utf-8')
+        return seg
+
+    def flush(self):
+        with self._lock:
+            records, self._buffer = self._buffer, []
+        if not records:
+            return
+        with self._io_lock:
+            for record in records:
+                line = json.dumps(record, default=str) + '\n'
+                size = len(line.encode('utf-8'))
+                day = datetime.date.fromtimestamp(record['ts']).isoformat()
+                seg = self._active(day, size)
+                self._file.write(line)
+                if seg['start'] is None:
+                    seg['start'] = record['ts']
+                seg['end'] = record['ts']
+                seg['count'] += 1
+                seg['bytes'] += size
+            self._file.flush()
+            if self.compress:
+                self._compress_closed()
+            self._save_index()
+
+    def _compress_closed(self):
+        for seg in self.segments:
+            if seg['closed'] and not seg['file'].endswith('.gz'):
+                src = os.path.join(self.path, seg['file'])
+                with open(src, 'rb') as f_in, gzip.open(src + '.gz.tmp', 'wb') as f_out:
+                    f_out.write(f_in.read())
+                os.replace(src + '.gz.tmp', src + '.gz')
+                seg['file'] += '.gz'
+                self._save_index()
+                os.remove(src)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[TOVA] Action log flush error: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+        with self._io_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    # Reading
+
+    def _read(self, seg):
+        full = os.path.join(self.path, seg['file'])
+        opener = gzip.open if full.endswith('.gz') else open
+        try:
+            with opener(full, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line after a crash
+        except FileNotFoundError:
+            return
+
+    def query(self, start=None, end=None, limit=None):
+        # Records with start <= ts < end, oldest first; with a limit, the
+        # newest `limit` of them. Buffered records are flushed first.
+        self.flush()
+        records = []
+        with self._io_lock:
+            segments = [
+                s for s in self.segments
+                if s['count'] and (start is None or s['end'] >= start) and (end is None or s['start'] < end)
+            ]
+            for seg in reversed(segments):
+                found = [
+                    r for r in self._read(seg)
+                    if (start is None or r['ts'] >= start) and (end is None or r['ts'] < end)
+                ]
+                records = found + records
+                if limit and len(records) >= limit:
+                    break
+        return records[-limit:] if limit else records
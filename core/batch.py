@@ -0,0 +1,160 @@
+# Headless front-end: runs commands through TovaEngine without a microphone
+# or speaker, for scripts and for replaying recorded commands. Input is one
+# command per line, or JSON lines with a "command" field (any other fields,
+# such as an "id", are copied to the output). Output is one JSON line per
+# command with the engine's result and how long it took:
+#
+#   {"id": 3, "command": "cpu usage", "status": "ok", "message": "...",
+#    "intent": "cpu usage", "seconds": 0.0042}
+#
+# Lines come out as commands finish unless --ordered is given. A summary
+# goes to stderr at the end. Commands that change the system or TOVA or
+# probe other hosts (kill, run, scan, clear memory) are refused with an
+# error unless --allow-actions is given; then, as by voice, each must be
+# followed by a "yes" record with the same "conversation". The yes must not
+# be handled first, so --allow-actions needs --workers 1 and no --processes.
+#
+#   python -m core.batch < commands.txt
+#   python -m core.batch --input commands.jsonl --output results.jsonl --workers 8
+#   python -m core.batch --processes 4 --no-persist < commands.txt
+import argparse
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from core import config
+from core.engine import TovaEngine
+
+_engine = None  # The engine of a --processes worker
+_conversations = itertools.count(1)
+
+
+def read_commands(lines):
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"[TOVA] Line {n}: invalid JSON, skipped", file=sys.stderr)
+                continue
+            if not record.get('command'):
+                print(f"[TOVA] Line {n}: no command, skipped", file=sys.stderr)
+                continue
+            yield record
+        else:
+            yield {"command": line}
+
+
+def _run(engine, record):
+    # Commands are separate conversations unless their records share a
+    # "conversation" field, so concurrent ones don't pick up each other's
+    # LLM context
+    conversation = record.get('conversation') or f"batch-{next(_conversations)}"
+    start = time.perf_counter()
+    try:
+        result = engine.handle_command(record['command'], conversation=conversation)
+    except Exception as e:
+        # The engine failed rather than the command; nothing was recorded
+        result = {"status": "error", "message": str(e), "exception": type(e).__name__}
+    return record, result, time.perf_counter() - start
+
+
+def _init_worker():
+    global _engine
+    sys.stdout = sys.stderr  # Keep engine prints out of the results
+    _engine = TovaEngine(persist=False, actions=False)
+
+
+def _run_in_worker(record):
+    # The worker's engine writes nothing; the parent records the result
+    return _run(_engine, record)
+
+
+def stream(executor, fn, records, window, ordered):
+    # Yields fn(record) for every record while keeping at most `window`
+    # submitted, so a long script is never read into memory all at once
+    pending = deque()
+    for record in records:
+        pending.append(executor.submit(fn, record))
+        while len(pending) >= window:
+            yield from _collect(pending, ordered)
+    while pending:
+        yield from _collect(pending, ordered)
+
+
+def _collect(pending, ordered):
+    if ordered:
+        yield pending.popleft().result()
+        return
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.remove(future)
+        yield future.result()
+
+
+def run_batch(engine, records, out, workers=4, processes=0, ordered=False):
+    # Returns (commands, errors, seconds). With `processes`, commands run in
+    # worker processes and their results are recorded here, one at a time,
+    # in the order they come back.
+    if processes:
+        executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker)
+        fn, window = _run_in_worker, processes * 4
+    else:
+        executor = ThreadPoolExecutor(workers, thread_name_prefix='tova-batch')
+        fn, window = (lambda record: _run(engine, record)), workers * 4
+    count = errors = 0
+    start = time.perf_counter()
+    with executor:
+        for record, result, seconds in stream(executor, fn, records, window, ordered):
+            if processes and 'exception' not in result:
+                engine.record(record['command'], result)
+            count += 1
+            errors += result.get('status') == 'error'
+            row = {**record, **result, "seconds": round(seconds, 4)}
+            out.write(json.dumps(row, default=str) + '\n')
+            out.flush()
+    return count, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run commands through TOVA without voice, writing results as JSON lines")
+    parser.add_argument('--input', help="Commands file, plain or JSONL (default stdin)")
+    parser.add_argument('--output', help="Results file (default stdout)")
+    parser.add_argument('--workers', type=int, default=4, help="Commands handled at once by one shared engine")
+    parser.add_argument('--processes', type=int, default=0, help="Use this many worker processes, each with its own engine, instead of threads")
+    parser.add_argument('--ordered', action='store_true', help="Write results in input order")
+    parser.add_argument('--no-persist', action='store_true', help="Write nothing: no memory, logs, history, caches or file index")
+    parser.add_argument('--memory-batch', type=int, default=100, help="Memory journal records written together")
+    parser.add_argument('--allow-actions', action='store_true', help="Let commands kill processes, run programs, scan ports or clear memory (each needs a following \"yes\")")
+    args = parser.parse_args()
+    if args.allow_actions and (args.workers > 1 or args.processes):
+        parser.error("--allow-actions needs --workers 1 and no --processes")
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    sys.stdout = sys.stderr  # Keep engine prints out of the results
+    source = open(args.input, 'r', encoding='utf-8') if args.input else sys.stdin
+    config.MEMORY_BATCH = args.memory_batch
+    engine = TovaEngine(persist=not args.no_persist, actions=args.allow_actions)
+    try:
+        count, errors, seconds = run_batch(engine, read_commands(source), out, args.workers, args.processes, args.ordered)
+    except KeyboardInterrupt:
+        count = None
+    finally:
+        engine.close()
+        if source is not sys.stdin:
+            source.close()
+        if args.output:
+            out.close()
+    if count is not None:
+        rate = count / seconds if seconds else 0.0
+        print(f"[TOVA] {count} commands in {seconds:.2f}s ({rate:.1f}/s), {errors} errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,140 @@
 import datetime
-from collections import defaultdict, Counter, deque
-from rapidfuzz import fuzz
-from dateutil.parser import parse as parse_dt
+import threading
+from collections import Counter, deque
+from core import config, tracing
+from core.habits import HabitIndex
+from core.skills import SkillIndex
+
+
+def _to_dt(t):
+    # Snapshots store epoch seconds; older memory.json files hold ISO strings
+    if isinstance(t, (int, float)):
+        return datetime.datetime.fromtimestamp(t)
+    if isinstance(t, str):
+        try:
+            return datetime.datetime.fromisoformat(t)
+        except ValueError:
+            from dateutil.parser import parse as parse_dt
+            return parse_dt(t)
+    return t
+
+
+def _to_ts(t):
+    return t.timestamp() if isinstance(t, datetime.datetime) else t
+
 
 class Brain:
-    def __init__(self, memory=None):
+    # Safe to share between threads: changes are applied one at a time and
+    # their journal records are written to memory in batches of `batch`.
+    def __init__(self, memory=None, batch=None):
         # Track command usage and habits
-        self.habits = defaultdict(list)  # command -> [timestamps]
+        self.habits = HabitIndex(config.HABIT_HALF_LIFE_DAYS)  # command -> hour/day histograms
         self.counter = Counter()
         self.recent_commands = deque(maxlen=20)
         self.conversation_history = deque(maxlen=50)
         self.user_preferences = {}
         self.skills = []
+        self.skill_index = SkillIndex(prefilter_above=config.SKILL_PREFILTER_ABOVE)
         self.memory = memory
+        self.batch = batch or config.MEMORY_BATCH
+        self._pending = []
+        self._lock = threading.RLock()
         if memory and hasattr(memory, 'data'):
             self._load_from_memory(memory.data)
 
     def _load_from_memory(self, data):
-        self.habits.update({
-            k: [parse_dt(t) if isinstance(t, str) else t for t in v]
-            for k, v in data.get('habits', {}).items()
-        })
+        self.habits.load(data.get('habits', {}), _to_dt)
         self.counter.update(data.get('counter', {}))
         self.recent_commands.extend([
-            (cmd, parse_dt(t) if isinstance(t, str) else t)
+            (cmd, _to_dt(t))
             for cmd, t in data.get('recent_commands', [])
         ])
         self.conversation_history.extend([
-            (parse_dt(t) if isinstance(t, str) else t, cmd, res)
+            (_to_dt(t), cmd, res)
             for t, cmd, res in data.get('conversation_history', [])
         ])
         self.user_preferences.update(data.get('user_preferences', {}))
-        self.skills = data.get('skills', [])
+        for skill in data.get('skills', []):
+            self._add_skill(skill)
+        for record in getattr(self.memory, 'journal', []):
+            self._apply(record)
 
-    def update(self, command: str, result: str = None):
-        now = datetime.datetime.now()
-        self.habits[command].append(now)
+    def _apply(self, record):
+        op = record.get('op')
+        if op == 'update':
+            self._record_command(record['cmd'], _to_dt(record['t']), record.get('result'))
+        elif op == 'pref':
+            self.user_preferences[record['key']] = record['value']
+        elif op == 'skill':
+            self._add_skill({'input': record['input'], 'action': record['action']})
+
+    def _record_command(self, command, now, result=None):
+        self.habits.add(command, now)
         self.counter[command] += 1
         self.recent_commands.append((command, now))
         if result:
             self.conversation_history.append((now, command, result))
-        if self.memory:
-            self.save_to_memory()
 
-    def save_to_memory(self):
+    def _persist(self, record):
+        # One journal line per change; the full snapshot is only rewritten
+        # once enough records have piled up.
         if not self.memory:
             return
-        self.memory.data['habits'] = {k: [t.isoformat() for t in v] for k, v in self.habits.items()}
-        self.memory.data['counter'] = dict(self.counter)
-        self.memory.data['recent_commands'] = [
-            (cmd, t.isoformat() if isinstance(t, datetime.datetime) else t)
-            for cmd, t in self.recent_commands
-        ]
-        self.memory.data['conversation_history'] = [
-            (t.isoformat() if isinstance(t, datetime.datetime) else t, cmd, res)
-            for t, cmd, res in self.conversation_history
-        ]
-        self.memory.data['user_preferences'] = self.user_preferences
-        self.memory.data['skills'] = self.skills
-        self.memory.save()
+        self._pending.append(record)
+        if len(self._pending) >= self.batch:
+            self.flush()
 
-    def learn_skill(self, example_input, example_action):
-        self.skills.append({'input': example_input, 'action': example_action})
-        if self.memory:
+    def flush(self):
+        # Writes the journal records still waiting for a full batch
+        with self._lock:
+            if not self.memory or not self._pending:
+                return
+            records, self._pending = self._pending, []
+            with tracing.span('memory.save'):
+                if hasattr(self.memory, 'append_many'):
+                    self.memory.append_many(records)
+                    if self.memory.needs_compaction():
+                        self.save_to_memory()
+                else:
+                    self.save_to_memory()
+
+    def update(self, command: str, result: str = None):
+        with tracing.span('brain.update'), self._lock:
+            now = datetime.datetime.now()
+            self._record_command(command, now, result)
+            self._persist({'op': 'update', 't': now.timestamp(), 'cmd': command, 'result': result})
+
+    def save_to_memory(self):
+        if not self.memory:
+            return
+        with self._lock:
+            self._pending = []  # The snapshot already includes them
+            self.memory.data['habits'] = self.habits.to_dict()
+            self.memory.data['counter'] = dict(self.counter)
+            self.memory.data['recent_commands'] = [
+                (cmd, _to_ts(t))
+                for cmd, t in self.recent_commands
+            ]
+            self.memory.data['conversation_history'] = [
+                (_to_ts(t), cmd, res)
+                for t, cmd, res in self.conversation_history
+            ]
+            self.memory.data['user_preferences'] = self.user_preferences
             self.memory.data['skills'] = self.skills
             self.memory.save()
 
+    def learn_skill(self, example_input, example_action):
+        with self._lock:
+            self._add_skill({'input': example_input, 'action': example_action})
+            self._persist({'op': 'skill', 'input': example_input, 'action': example_action})
+
+    def _add_skill(self, skill):
+        self.skills.append(skill)
+        self.skill_index.add(skill)
+
     def match_skill(self, user_input, threshold=80):
-        best = None
-        best_score = 0
-        for skill in self.skills:
-            score = fuzz.partial_ratio(user_input.lower(), skill['input'].lower())
-            if score > best_score:
-                best = skill
-                best_score = score
-        if best and best_score >= threshold:
-            return best['action']
-        return None
+        best = self.skill_index.match(user_input, threshold)
+        return best['action'] if best else None
 
     def suggest(self, top_n=3):
         # Suggest most frequent and most recent commands
@@ -87,21 +145,16 @@ class Brain:
     def get_habits(self):
         # Return commands used at similar times of day
         now = datetime.datetime.now()
-        hour = now.hour
-        habits = []
-        for cmd, times in self.habits.items():
-            if any(abs(t.hour - hour) <= 1 for t in times if isinstance(t, datetime.datetime)):
-                habits.append(cmd)
-        return habits
+        return self.habits.around(now.hour, now=now)
 
     def get_context(self):
         # Return last few conversation turns for context-aware responses
         return list(self.conversation_history)[-5:]
 
     def set_preference(self, key, value):
-        self.user_preferences[key] = value
-        if self.memory:
-            self.save_to_memory()
+        with self._lock:
+            self.user_preferences[key] = value
+            self._persist({'op': 'pref', 'key': key, 'value': value})
 
     def get_preference(self, key, default=None):
         return self.user_preferences.get(key, default) 
\ No newline at end of file
@@ -3,9 +3,128 @@ import os
 TOVA_NAME = "TOVA"
 MEMORY_PATH = os.path.join(os.path.dirname(__file__), '../memory/memory.json')
 LOGS_PATH = os.path.join(os.path.dirname(__file__), '../memory/logs/')
+CACHE_PATH = os.path.join(os.path.dirname(__file__), '../memory/cache/')
 VOICE = {
     "rate": 160,
     "volume": 1.0,
     "voice_id": None  # To be set by TTS engine
 }
-UI_THEME = "neon_glass" 
\ No newline at end of file
+UI_THEME = "neon_glass"
+TTS_CACHE_BYTES = 32 * 1024 * 1024  # Rendered phrases kept in memory
+WAKE_ACK = "Yes?"  # Spoken when the wake word is heard; None to stay silent
+
+# Intent detection
+INTENT_MODEL = 'paraphrase-MiniLM-L6-v2'
+INTENT_THRESHOLD = 0.6  # Minimum embedding score for routing to a tool
+CONFIRM_TIMEOUT = 30  # Seconds a "kill process" / "run ..." question waits for a yes
+
+# Memory persistence
+MEMORY_COMPACT_EVERY = 200  # Journal records before memory.json is rewritten
+MEMORY_FSYNC = False  # fsync the journal on every command
+MEMORY_BATCH = 1  # Journal records written together; a crash loses at most this many
+HABIT_HALF_LIFE_DAYS = None  # e.g. 30 to let old habits fade; None keeps them forever
+SKILL_PREFILTER_ABOVE = 2000  # Trigram-prefilter skill matching past this many skills
+
+# Ollama
+OLLAMA_URL = 'http://localhost:11434/api/generate'
+OLLAMA_KEEP_ALIVE = "30m"  # How long Ollama keeps the model loaded between requests
+OLLAMA_MAX_CONTEXT = 2048  # Drop reused conversation context past this many tokens
+OLLAMA_POOL_SIZE = 4  # Pooled keep-alive connections per client
+OLLAMA_CONVERSATIONS = 32  # Conversations whose context is kept for the next turn
+
+# LLM response cache
+RESPONSE_CACHE_SIZE = 256  # Entries kept (least recently used are evicted)
+RESPONSE_CACHE_TTL = 24 * 3600  # Seconds; None keeps entries until evicted
+RESPONSE_CACHE_PERSIST = True  # Keep the cache in memory/cache/ across restarts
+# Intents whose answer changes over time are never served from the cache
+NO_CACHE_INTENTS = {"time", "weather", "history", "show logs", "uptime", "cpu usage", "ram usage", "disk usage", "list processes", "public ip", "list jobs", "recall"}
+
+# Runtime
+COMMAND_QUEUE_SIZE = 8  # Recognized commands waiting to be handled
+AUDIO_QUEUE_BLOCKS = 32  # Captured audio blocks buffered ahead of recognition
+# Speaking over TTS interrupts it. Only useful with a headset or echo
+# cancellation, since the mic otherwise hears TTS too; what is heard while
+# TTS plays only interrupts and is never run as a command. False ignores the
+# mic while TTS plays.
+VOICE_BARGE_IN = False
+
+# Speech recognition
+WAKE_WORD = None  # e.g. "computer"; must be in the Vosk model's vocabulary. None = always listening
+WAKE_TIMEOUT = 8.0  # Seconds to wait for a command after the wake word
+VOICE_BLOCKSIZE = 8000  # Frames per audio block at 16 kHz (500 ms)
+VOICE_LOW_LATENCY = False  # Smaller blocks and early triggering on partial results
+VOICE_LOW_LATENCY_BLOCKSIZE = 1600  # 100 ms
+VOICE_PARTIAL_STABLE_MS = 300  # How long a partial result must stay unchanged to trigger early
+
+# File search index
+FILE_INDEX_ENABLED = True
+FILE_INDEX_ROOTS = [os.path.expanduser('~')]
+FILE_INDEX_PATH = os.path.join(CACHE_PATH, 'files.db')
+FILE_INDEX_EXCLUDE = ['.git', '.cache', 'node_modules', '__pycache__', '.venv', 'venv']
+FILE_INDEX_RESCAN = 3600  # Seconds between full rescans when inotify is unavailable
+FILE_INDEX_FUZZY_CANDIDATES = 2000  # Trigram hits ranked by rapidfuzz for fuzzy queries
+
+# File reading
+READ_FILE_MAX_BYTES = 256 * 1024  # Larger files are summarized unless a range is asked for
+READ_FILE_SUMMARY_LINES = 20  # Lines from each end in a summary
+
+# Port scanning
+PORT_SCAN_CONCURRENCY = 256  # Connection attempts in flight at once
+PORT_SCAN_RATE = 500  # Max connection attempts per second to any one host; 0 = unlimited
+PORT_SCAN_MAX_HOSTS = 1024  # Larger ranges (e.g. a /8) are refused
+
+# System metrics
+METRICS_SAMPLER = True  # Sample CPU/RAM/disk/network in the background
+METRICS_INTERVAL = 2.0  # Seconds between samples
+METRICS_HISTORY = 3600  # Seconds of samples kept for "over the last ..." queries
+
+# Process table
+PROCESS_REFRESH_INTERVAL = 1.0  # Seconds a process snapshot is reused before re-reading /proc
+
+# Terminal jobs
+TERMINAL_TIMEOUT = 30  # Seconds before a blocking run_terminal_command is killed
+TERMINAL_FOREGROUND_WAIT = 10  # Seconds "run ..." waits before leaving the job in the background
+TERMINAL_JOB_TIMEOUT = None  # Seconds before a background job is killed; None = never
+TERMINAL_OUTPUT_LINES = 2000  # Lines of output kept per job (older lines are dropped)
+TERMINAL_LINE_CHARS = 4096  # Longer output lines are cut (the rest of the line is dropped)
+TERMINAL_KEEP_FINISHED = 20  # Finished jobs kept for "job status"
+TERMINAL_KILL_GRACE = 3.0  # Seconds between SIGTERM and SIGKILL when cancelling
+TERMINAL_BACKGROUND_COMMANDS = ['nmap', 'sqlmap']  # Always started as background jobs
+
+# Action log
+LOG_FLUSH_INTERVAL = 1.0  # Seconds between background writes of logged commands
+LOG_BUFFER_MAX = 500  # Records buffered before an early flush
+LOG_SEGMENT_BYTES = 4 * 1024 * 1024  # A day's log is split into segments of about this size
+LOG_COMPRESS = True  # Gzip segments once they are finished
+
+# Tracing
+TRACING = False  # Per-stage timings for every command; off costs next to nothing
+TRACE_PATH = os.path.join(LOGS_PATH, 'traces.jsonl')  # One JSON line per command
+TRACE_PROMETHEUS_PATH = os.path.join(CACHE_PATH, 'metrics.prom')  # Prometheus text file; None = don't write
+TRACE_PROMETHEUS_EVERY = 10  # Seconds between rewrites of the Prometheus file
+TRACE_HTTP_PORT = None  # e.g. 9464 serves /metrics and /summary on 127.0.0.1
+TRACE_WINDOW = 500  # Samples per stage kept for rolling percentiles
+TRACE_SLOW_MS = None  # Commands slower than this get a cProfile dump; None = no profiling
+TRACE_PROFILE_PATH = os.path.join(LOGS_PATH, 'profiles')
+
+# Conversation history
+HISTORY_ENABLED = True  # Keep every turn with an embedding for "when did I ..." recall
+HISTORY_PATH = os.path.join(os.path.dirname(__file__), '../memory/history/')
+HISTORY_BATCH = 64  # Turns encoded per batch by the background encoder
+HISTORY_ENCODE_INTERVAL = 5.0  # Seconds the encoder sleeps when there is nothing new
+HISTORY_MIN_SCORE = 0.35  # Cosine similarity below which a turn is not a match
+
+# Daemon
+LLM_CONCURRENCY = 1  # LLM requests sent to Ollama at once; the rest wait by priority
+DAEMON_ENABLED = False  # main.py also serves other front-ends from its engine
+DAEMON_SOCKET = os.path.join(os.path.dirname(__file__), '../memory/tova.sock')
+DAEMON_PORT = None  # e.g. 8765 also accepts clients on 127.0.0.1 (same protocol)
+# TCP clients must first send the token in this file (created, readable only
+# by its owner, when the daemon starts); Unix socket clients are checked by
+# the socket's permissions instead
+DAEMON_TOKEN_PATH = os.path.join(os.path.dirname(__file__), '../memory/daemon.token')
+DAEMON_WORKERS = 8  # Commands routed and tool commands answered at once; these never wait for the LLM queue
+DAEMON_LLM_WORKERS = 32  # Commands going to the LLM at once, most of them waiting in its queue
+
+# Startup
+OLLAMA_PRELOAD = True  # Load the model into Ollama while everything else starts, not on the first chat
@@ -4,12 +4,18 @@ from core.memory import Memory
 from core.brain import Brain
 from core import config
 import os
-import datetime
 import subprocess
 from rapidfuzz import fuzz, process
 import random
-from sentence_transformers import SentenceTransformer, util
 from core.ollama_client import OllamaClient
+from core.response_cache import ResponseCache
+from core.action_log import ActionLog
+from core import tracing
+from core.scheduler import LLMScheduler, PRIORITY_CHAT, PRIORITY_COMMAND
+from core.intent import IntentDetector
+from core.router import IntentRouter
+import threading
+import time
 
 EXAMPLES = [
     "reboot (restarts your computer)",
@@ -21,6 +27,7 @@ EXAMPLES = [
     "read file <path> (shows file content)",
     "delete file <path> (removes a file, asks for confirmation)",
     "ping <host> (network test)",
+    "scan ports on <host> [ports 1-1024] (checks for open ports)",
     "public ip (shows your public IP address)",
     "list users (shows all system users)",
     "change password <user> <newpass>",
@@ -30,12 +37,14 @@ EXAMPLES = [
     "cpu usage / ram usage / disk usage",
     "clear memory (clears assistant memory)",
     "show logs (shows today's logs)",
-    "what did I do last friday (shows your command history)",
+    "what did I do yesterday / last friday / this week (shows your command history)",
+    "when did I ask about <topic> [last week] (searches everything you've asked)",
     "what time is it / current time",
     "weather / what's the weather",
     "open <program> (launches a program)",
     "run nmap <args> (network scan)",
     "run sqlmap <args> (SQL injection test)",
+    "list jobs / status of job <id> / kill job <id> (long-running commands)",
     "You can also just chat with me!"
 ]
 
@@ -90,6 +99,7 @@ INTENT_COMMANDS = [
     "delete file",
     "create file",
     "ping",
+    "port scan",
     "public ip",
     "list users",
     "change password",
@@ -103,11 +113,14 @@ INTENT_COMMANDS = [
     "clear memory",
     "show logs",
     "history",
+    "recall",
     "time",
     "weather",
     "open program",
     "run nmap",
     "run sqlmap",
+    "list jobs",
+    "kill job",
     "help",
     "chat",
 ]
@@ -116,43 +129,47 @@ INTENT_PATTERNS = {
     "reboot": ["reboot", "restart system", "restart computer"],
     "shutdown": ["shutdown", "power off", "turn off"],
     "update": ["update", "system update", "upgrade"],
-    "uptime": ["uptime", "how long running"],
+    "uptime": ["uptime", "how long running", "been running"],
     "run terminal command": ["run ", "exec "],
     "search file": ["search file", "find file"],
-    "read file": ["read file"],
+    "read file": ["read file", "lines of"],
     "delete file": ["delete file"],
     "create file": ["create file"],
     "ping": ["ping"],
-    "public ip": ["public ip", "my ip"],
-    "list users": ["list users"],
+    "port scan": ["port scan", "scan ports", "scan port"],
+    "public ip": ["public ip", "my ip", "ip address", "ip"],
+    "list users": ["list users", "users", "user accounts"],
     "change password": ["change password"],
     "switch user": ["switch user"],
-    "list processes": ["list processes"],
-    "kill process": ["kill process"],
-    "monitor process": ["monitor process"],
-    "cpu usage": ["cpu usage"],
-    "ram usage": ["ram usage", "memory usage"],
-    "disk usage": ["disk usage"],
-    "clear memory": ["clear memory"],
-    "show logs": ["show logs"],
+    "list processes": ["list processes", "processes"],
+    "kill process": ["kill process", "kill pid"],
+    "monitor process": ["monitor process", "monitor pid"],
+    "cpu usage": ["cpu usage", "cpu load", "cpu use", "average cpu", "peak cpu", "max cpu",
+                  "processor usage", "processor load", "average processor", "peak processor", "max processor"],
+    "ram usage": ["ram usage", "ram load", "ram use", "memory usage", "memory use", "memory load",
+                  "average ram", "peak ram", "max ram", "average memory", "peak memory", "max memory"],
+    "disk usage": ["disk usage", "disk space", "disk"],
+    "clear memory": ["clear memory", "clear your memory", "clear the memory"],
+    "show logs": ["show logs", "logs", "log entries"],
     "history": ["what did i do"],
+    "recall": ["when did i", "did i ask", "have i asked", "what did i ask", "what did i say"],
     "time": ["what time is it", "current time", "time"],
     "weather": ["weather", "forecast", "temperature"],
     "open program": ["open "],
     "run nmap": ["nmap"],
     "run sqlmap": ["sqlmap"],
-    "help": ["what can you do", "help", "list capabilities"],
+    "list jobs": ["list jobs", "jobs", "job status", "status of job"],
+    "kill job": ["kill job", "cancel job", "stop job"],
+    "help": ["what can you do", "help", "capabilities"],
     "chat": ["hi", "hello", "hey", "how are you", "good morning", "good evening", "good night", "who are you", "your name"],
 }
 
-model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-intent_embs = model.encode(INTENT_COMMANDS, convert_to_tensor=True)
+# Rule matches are answered without touching the embedding model; the model
+# and the intent matrix are only loaded on the first input the rules miss.
+intent_detector = IntentDetector(INTENT_COMMANDS, INTENT_PATTERNS)
 
-def detect_intent(user_input):
-    emb = model.encode(user_input, convert_to_tensor=True)
-    scores = util.pytorch_cos_sim(emb, intent_embs)[0]
-    best_idx = int(scores.argmax())
-    return INTENT_COMMANDS[best_idx], float(scores[best_idx])
+def detect_intent(user_input, persist=True):
+    return intent_detector.detect(user_input, persist)
 
 def friendly_reply(text):
     if not text:
@@ -161,28 +178,171 @@ def friendly_reply(text):
     return prefix + text
 
 class TovaEngine:
-    def __init__(self):
-        self.memory = Memory()
+    def __init__(self, persist=True, actions=True):
+        # persist=False reads memory.json but writes nothing: no memory,
+        # action log, history, response or intent cache files and no file
+        # index (for throughput runs).
+        # actions=False refuses commands that change the system or TOVA or
+        # probe other hosts (kill, run, scan, clear memory) instead of asking
+        # to confirm them.
+        self.persist = persist
+        self.memory = Memory(persist=persist)
         self.brain = Brain(memory=self.memory)
         self.log_path = config.LOGS_PATH
-        self.ollama = OllamaClient()
+        self.action_log = ActionLog(self.log_path, persist=persist)
+        self.history = None
+        if config.HISTORY_ENABLED and persist:
+            from core.history import HistoryStore
+            self.history = HistoryStore().start()
+            if not self.history.count:
+                self._backfill_history()
+        cache_path = os.path.join(config.CACHE_PATH, 'responses.json') if config.RESPONSE_CACHE_PERSIST and persist else None
+        # Every front-end sharing this engine queues its LLM requests here
+        self.llm_queue = LLMScheduler(config.LLM_CONCURRENCY)
+        self.ollama = OllamaClient(cache=ResponseCache(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL, cache_path), scheduler=self.llm_queue)
+        self._record_lock = threading.Lock()
+        self.router = IntentRouter(self, threshold=config.INTENT_THRESHOLD, actions=actions)
+        if config.METRICS_SAMPLER and persist:
+            from tools.monitor import get_sampler
+            get_sampler()  # Start collecting history now so it's there when asked for
+
+    @property
+    def route_stats(self):
+        return self.router.stats
+
+    def is_complete_command(self, text):
+        # True when the text, as heard so far, already is a whole tool
+        # command, so the voice listener may act on it before the user stops
+        return self.router.is_complete(intent_detector.match_rules(text), text)
+
+    def _backfill_history(self):
+        # First run with a history store: seed it from the action log
+        records = self.action_log.query()
+        if records:
+            self.history.extend([(r['ts'], r['command'], (r.get('result') or {}).get('message')) for r in records])
+        elif self.brain.conversation_history:
+            self.history.extend([(t.timestamp(), cmd, res) for t, cmd, res in self.brain.conversation_history])
+
+    def close(self):
+        self.ollama.close()
+        if self.history:
+            self.history.close()
+        self.action_log.close()
+        tracing.close()
+        self.brain.save_to_memory()
+        self.memory.close()
 
     def log_action(self, command, result):
-        os.makedirs(self.log_path, exist_ok=True)
-        log_file = os.path.join(self.log_path, f'{datetime.date.today()}.log')
-        with open(log_file, 'a') as f:
-            f.write(f"[{datetime.datetime.now()}] {command} => {result}\n")
+        self.action_log.log(command, result)
 
-    def handle_command(self, command: str) -> dict:
-        command = command.strip()
+    def _system_prompt(self):
         name = self.brain.get_preference('user_name', 'friend')
-        system_prompt = (
+        return (
             f"You are TOVA (Tech Operative Virtual Assistant), a helpful Linux AI assistant. Respond to the user's requests, including Linux commands, questions, and general conversation. "
             f"If the user asks for a command, provide the answer or the command to run. The user's name is {name}. "
             "Please keep your responses short and concise (1-2 sentences), unless the user asks for more detail."
         )
-        ollama_reply = self.ollama.generate(command, system=system_prompt)
-        result = {"status": "ok", "message": friendly_reply(ollama_reply)}
-        self.brain.update(command, result.get("message"))
-        self.log_action(command, result)
-        return result 
\ No newline at end of file
+
+    def _route(self, command, conversation=None):
+        # (intent, result, command). After a "yes" the command is the action
+        # that ran, so memory and the logs record that rather than "yes".
+        with tracing.span('route'):
+            confirmed = self.router.confirm(command, conversation)
+            if confirmed:
+                return confirmed
+            intent, score = detect_intent(command, self.persist)
+            return intent, self.router.handle(intent, score, command, conversation), command
+
+    @staticmethod
+    def _reply(intent, result):
+        result["intent"] = intent
+        # A question back or an error reads oddly after "Sure!"
+        if result.get("status") not in ("confirm", "error"):
+            result["message"] = friendly_reply(result.get("message"))
+        return result
+
+    def record(self, command, result):
+        # Commands from several clients can finish at once; memory, history
+        # and the log are updated for one at a time, in the same order. An
+        # action asked about is recorded once it runs, not when asked.
+        if result.get("status") == "confirm":
+            return result
+        with self._record_lock:
+            self.brain.update(command, result.get("message"))
+            if self.history:
+                self.history.add(command, result.get("message"))
+            self.log_action(command, result)
+        return result
+
+    @staticmethod
+    def _priority(intent):
+        return PRIORITY_CHAT if intent in (None, "chat") else PRIORITY_COMMAND
+
+    def handle_command(self, command: str, cancel=None, conversation=None) -> dict:
+        # `conversation` tells apart front-ends sharing this engine, e.g.
+        # which one a "yes" to a pending action comes from
+        command = command.strip()
+        # A caller that traces the whole reply (e.g. including speech) has
+        # already begun the trace; otherwise it covers just this call
+        trace = None if tracing.current() else tracing.begin(command)
+        try:
+            intent, result, command = self._route(command, conversation)
+            if result is None:
+                start = time.perf_counter()
+                ollama_reply = self.ollama.generate(
+                    command, system=self._system_prompt(), use_cache=intent not in config.NO_CACHE_INTENTS,
+                    priority=self._priority(intent), cancel=cancel, conversation=conversation,
+                )
+                if cancel is not None and cancel.is_set():
+                    return {"status": "cancelled", "message": "", "intent": intent}
+                self.route_stats.record("llm", time.perf_counter() - start)
+                result = {"status": "ok", "message": ollama_reply}
+            return self.record(command, self._reply(intent, result))
+        finally:
+            tracing.finish(trace)
+
+    def stream_command(self, command: str, cancel=None, conversation=None):
+        # Same as handle_command, but yields the reply text piece by piece as
+        # the LLM produces it. Memory and logs are updated once it completes;
+        # a reply cut short by `cancel` is not recorded.
+        command = command.strip()
+        trace = None if tracing.current() else tracing.begin(command)
+        try:
+            intent, result, command = self.route_command(command, conversation)
+            if result is not None:
+                yield result["message"]
+                self.record(command, result)
+                return
+            yield from self.stream_llm(command, intent, cancel, conversation)
+        finally:
+            tracing.finish(trace)
+
+    # stream_command in two halves, for callers that keep tool replies off
+    # the threads that wait for the LLM (the daemon)
+
+    def route_command(self, command: str, conversation=None):
+        # (intent, result, command): the tool's reply, still to be passed to
+        # record() with the command returned, or None when stream_llm() has
+        # to answer
+        intent, result, command = self._route(command.strip(), conversation)
+        return intent, (self._reply(intent, result) if result is not None else None), command
+
+    def stream_llm(self, command: str, intent, cancel=None, conversation=None):
+        # Yields the LLM's reply and records it once complete
+        command = command.strip()
+        start = time.perf_counter()
+        prefix = random.choice(FRIENDLY_PREFIXES)
+        yield prefix
+        parts = []
+        tokens = self.ollama.stream(
+            command, system=self._system_prompt(), use_cache=intent not in config.NO_CACHE_INTENTS,
+            priority=self._priority(intent), cancel=cancel, conversation=conversation,
+        )
+        for token in tokens:
+            parts.append(token)
+            yield token
+        if cancel is not None and cancel.is_set():
+            return
+        self.route_stats.record("llm", time.perf_counter() - start)
+        reply = ''.join(parts).strip()
+        self.record(command, {"status": "ok", "message": prefix + reply, "intent": intent})
@@ -0,0 +1,78 @@
+import datetime
+
+
+class HabitIndex:
+    # Per-command hour-of-day and day-of-week histograms. Memory per command
+    # is fixed (24 + 7 weights) no matter how often it is used. With a half
+    # life set, old usage fades: weights are scaled down lazily, only when a
+    # command is touched or queried.
+    def __init__(self, half_life_days=None):
+        self.half_life = half_life_days * 86400 if half_life_days else None
+        self.hours = {}
+        self.days = {}
+        self.last = {}
+
+    def __len__(self):
+        return len(self.hours)
+
+    def __contains__(self, command):
+        return command in self.hours
+
+    def __iter__(self):
+        return iter(self.hours)
+
+    def _factor(self, command, ts):
+        if not self.half_life:
+            return 1.0
+        return 0.5 ** (max(0.0, ts - self.last[command]) / self.half_life)
+
+    def add(self, command, when: datetime.datetime):
+        ts = when.timestamp()
+        if command not in self.hours:
+            self.hours[command] = [0.0] * 24
+            self.days[command] = [0.0] * 7
+            self.last[command] = ts
+        elif self.half_life and ts > self.last[command]:
+            factor = self._factor(command, ts)
+            self.hours[command] = [w * factor for w in self.hours[command]]
+            self.days[command] = [w * factor for w in self.days[command]]
+            self.last[command] = ts
+        self.hours[command][when.hour] += 1
+        self.days[command][when.weekday()] += 1
+
+    def around(self, hour, window=1, now=None):
+        # Commands used within +/- window hours of `hour` (wrapping past
+        # midnight), strongest habit first.
+        ts = (now or datetime.datetime.now()).timestamp()
+        slots = [(hour + d) % 24 for d in range(-window, window + 1)]
+        scored = []
+        for cmd, hist in self.hours.items():
+            weight = sum(hist[s] for s in slots) * self._factor(cmd, ts)
+            if weight > 0:
+                scored.append((weight, cmd))
+        scored.sort(key=lambda x: -x[0])
+        return [cmd for _, cmd in scored]
+
+    def on_day(self, weekday, now=None):
+        ts = (now or datetime.datetime.now()).timestamp()
+        scored = [(hist[weekday] * self._factor(cmd, ts), cmd) for cmd, hist in self.days.items()]
+        scored.sort(key=lambda x: -x[0])
+        return [cmd for weight, cmd in scored if weight > 0]
+
+    def to_dict(self):
+        return {
+            cmd: {'hours': self.hours[cmd], 'days': self.days[cmd], 'last': self.last[cmd]}
+            for cmd in self.hours
+        }
+
+    def load(self, data, to_dt):
+        # Accepts both the histogram form and the legacy
+        # {command: [timestamps]} form, folding the latter into histograms.
+        for cmd, value in data.items():
+            if isinstance(value, dict):
+                self.hours[cmd] = list(value['hours'])
+                self.days[cmd] = list(value['days'])
+                self.last[cmd] = value['last']
+            else:
+                for t in sorted(to_dt(t) for t in value):
+                    self.add(cmd, t)
@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+from core import config
+from core.intent import get_model
+
+
+class HistoryStore:
+    # Every command (and the reply to it) ever handled, searchable by date
+    # and by meaning. Rows are append-only (until clear()) and kept in parallel files:
+    #   turns.jsonl     the text, one JSON line per row
+    #   offsets.i64     where each row starts in turns.jsonl
+    #   times.f64       each row's timestamp, ascending
+    #   embeddings.f32  one normalized embedding per row
+    # The numeric files are memory-mapped, so a date range is a binary search
+    # over times.f64 and a recall query a single matrix-vector product over
+    # the rows in that range, with the pages left to the OS cache instead of
+    # the heap. Embeddings are computed in batches on a background thread;
+    # rows that aren't encoded yet are only missing from search().
+    def __init__(self, path=None, batch=None):
+        import numpy as np
+        self.np = np
+        self.path = path or config.HISTORY_PATH
+        self.batch = batch or config.HISTORY_BATCH
+        os.makedirs(self.path, exist_ok=True)
+        self.turns_path = os.path.join(self.path, 'turns.jsonl')
+        self.offsets_path = os.path.join(self.path, 'offsets.i64')
+        self.times_path = os.path.join(self.path, 'times.f64')
+        self.embeddings_path = os.path.join(self.path, 'embeddings.f32')
+        self.meta_path = os.path.join(self.path, 'meta.json')
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._generation = 0  # Bumped by clear(), so encoding in flight is thrown away
+        self._maps = {}
+        self.meta = self._load_meta()
+        self.count = self._repair()
+
+    # Files
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self):
+        tmp = self.meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+
+    def _size(self, path):
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _repair(self):
+        # After a crash the files can disagree by a row or a torn write;
+        # cut them all back to the rows every file has
+        count = min(self._size(self.offsets_path) // 8, self._size(self.times_path) // 8)
+        for path in (self.offsets_path, self.times_path):
+            if self._size(path) != count * 8:
+                os.truncate(path, count * 8)
+        if count:
+            end = int(self._map(self.offsets_path, 'int64', count)[-1])
+            with open(self.turns_path, 'rb') as f:
+                f.seek(end)
+                f.readline()
+                if f.tell() != self._size(self.turns_path):
+                    os.truncate(self.turns_path, f.tell())
+        elif self._size(self.turns_path):
+            os.truncate(self.turns_path, 0)
+        if self.meta.get('model') != config.INTENT_MODEL:
+            # A different model means different vectors; re-encode everything
+            if os.path.exists(self.embeddings_path):
+                os.remove(self.embeddings_path)
+            self.meta = {'model': config.INTENT_MODEL, 'dim': None}
+            self._save_meta()
+        dim = self.meta.get('dim')
+        if dim:
+            rows = min(self._size(self.embeddings_path) // (4 * dim), count)
+            if self._size(self.embeddings_path) != rows * 4 * dim:
+                os.truncate(self.embeddings_path, rows * 4 * dim)
+        return count
+
+    def _map(self, path, dtype, rows, dim=None):
+        # Read-only memmap of the first `rows` rows, re-made only as the file grows
+        if not rows:
+            return self.np.empty((0, dim) if dim else 0, dtype=dtype)
+        cached = self._maps.get(path)
+        if cached is None or cached.shape[0] != rows:
+            shape = (rows, dim) if dim else (rows,)
+            cached = self._maps[path] = self.np.memmap(path, dtype=dtype, mode='r', shape=shape)
+        return cached
+
+    @property
+    def encoded(self):
+        dim = self.meta.get('dim')
+        return min(self._size(self.embeddings_path) // (4 * dim), self.count) if dim else 0
+
+    # Writing
+
+    def add(self, command, reply=None, ts=None):
+        self.extend([(ts or time.time(), command, reply)])
+
+    def extend(self, turns):
+        # turns: [(timestamp, command, reply)] in chronological order
+        np = self.np
+        with self._lock:
+            last = float(self._map(self.times_path, 'float64', self.count)[-1]) if self.count else 0.0
+            offsets, times = [], []
+            with open(self.turns_path, 'ab') as f:
+                for ts, command, reply in turns:
+                    ts = max(float(ts), last)  # Keep times.f64 sorted for searchsorted
+                    last = ts
+                    offsets.append(f.tell())
+                    times.append(ts)
+                    f.write((json.dumps({'ts': ts, 'command': command, 'reply': reply}) + '\n').encode('utf-8'))
+            with open(self.offsets_path, 'ab') as f:
+                f.write(np.asarray(offsets, dtype='int64').tobytes())
+            with open(self.times_path, 'ab') as f:
+                f.write(np.asarray(times, dtype='float64').tobytes())
+            self.count += len(turns)
+        self._wake.set()
+
+    def _texts(self, lo, hi):
+        offsets = self._map(self.offsets_path, 'int64', self.count)
+        texts = []
+        with open(self.turns_path, 'rb') as f:
+            f.seek(int(offsets[lo]))
+            for _ in range(lo, hi):
+                texts.append(json.loads(f.readline())['command'])
+        return texts
+
+    def encode_pending(self):
+        # Encodes rows that have no embedding yet; returns how many
+        done = 0
+        while True:
+            with self._lock:
+                generation = self._generation
+                lo = self.encoded
+                hi = min(self.count, lo + self.batch)
+                if lo >= hi:
+                    return done
+                texts = self._texts(lo, hi)
+            vectors = get_model().encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+            vectors = vectors.astype('float32')
+            with self._lock:
+                if generation != self._generation:
+                    return done
+                if not self.meta.get('dim'):
+                    self.meta['dim'] = int(vectors.shape[1])
+                    self._save_meta()
+                with open(self.embeddings_path, 'ab') as f:
+                    f.write(vectors.tobytes())
+            done += hi - lo
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(config.HISTORY_ENCODE_INTERVAL)
+            self._wake.clear()
+            try:
+                self.encode_pending()
+            except Exception as e:
+                print(f"[TOVA] History encoder error: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def clear(self):
+        # Forgets every turn ("clear memory"). Readers take the lock too, so
+        # none of them is left holding a map of a removed file.
+        with self._lock:
+            self._generation += 1
+            self._maps.clear()
+            for path in (self.turns_path, self.offsets_path, self.times_path, self.embeddings_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.count = 0
+            self.meta['dim'] = None
+            self._save_meta()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+
+    # Reading
+
+    def _rows(self, start=None, end=None):
+        times = self._map(self.times_path, 'float64', self.count)
+        lo = int(times.searchsorted(start, 'left')) if start is not None else 0
+        hi = int(times.searchsorted(end, 'left')) if end is not None else len(times)
+        return lo, hi
+
+    def _turn(self, row, offsets):
+        with open(self.turns_path, 'rb') as f:
+            f.seek(int(offsets[row]))
+            return json.loads(f.readline())
+
+    def turns(self, start=None, end=None, limit=None):
+        # Rows with start <= ts < end, oldest first; with a limit, the newest
+        with self._lock:
+            lo, hi = self._rows(start, end)
+            if limit:
+                lo = max(lo, hi - limit)
+            offsets = self._map(self.offsets_path, 'int64', self.count)
+            if lo >= hi:
+                return []
+            with open(self.turns_path, 'rb') as f:
+                f.seek(int(offsets[lo]))
+                return [json.loads(f.readline()) for _ in range(lo, hi)]
+
+    def search(self, query, k=5, start=None, end=None, min_score=None):
+        # Top-k turns by cosine similarity to `query`, best first
+        q = get_model().encode(query, convert_to_numpy=True, normalize_embeddings=True).astype('float32')
+        with self._lock:
+            return self._search(q, k, start, end, min_score)
+
+    def _search(self, q, k, start, end, min_score):
+        np = self.np
+        lo, hi = self._rows(start, end)
+        hi = min(hi, self.encoded)
+        if lo >= hi:
+            return []
+        matrix = self._map(self.embeddings_path, 'float32', self.encoded, self.meta['dim'])
+        scores = matrix[lo:hi] @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        min_score = config.HISTORY_MIN_SCORE if min_score is None else min_score
+        offsets = self._map(self.offsets_path, 'int64', self.count)
+        results = []
+        for i in top:
+            if scores[i] < min_score:
+                break
+            turn = self._turn(lo + int(i), offsets)
+            turn['score'] = float(scores[i])
+            results.append(turn)
+        return results
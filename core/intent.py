@@ -0,0 +1,113 @@
+import hashlib
+import os
+import re
+import threading
+from core import config
+
+# The SentenceTransformer model is shared by everything that needs embeddings
+# and is only loaded the first time one of them actually asks for it.
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(config.INTENT_MODEL)
+    return _model
+
+
+class IntentDetector:
+    def __init__(self, commands, patterns, model_name=None, cache_dir=None):
+        self.commands = list(commands)
+        self.model_name = model_name or config.INTENT_MODEL
+        self.cache_dir = cache_dir or config.CACHE_PATH
+        self._embs = None
+        self._lock = threading.Lock()
+        self._compile(patterns)
+
+    def _compile(self, patterns):
+        # Patterns with a trailing space ("run ", "open ") are command prefixes
+        # and only count at the start of the utterance. Everything else is a
+        # keyword matched on word boundaries, all in one alternation so a
+        # single scan finds every candidate.
+        self._keywords = {}
+        self._prefixes = []
+        for intent, pats in patterns.items():
+            for pat in pats:
+                pat = pat.lower()
+                if pat.endswith(' '):
+                    self._prefixes.append((pat, intent))
+                else:
+                    self._keywords.setdefault(pat, intent)
+        alternation = '|'.join(re.escape(p) for p in sorted(self._keywords, key=len, reverse=True))
+        self._keyword_re = re.compile(r'(?<!\w)(?:' + alternation + r')(?!\w)') if alternation else None
+        self._prefixes.sort(key=lambda p: len(p[0]), reverse=True)
+
+    def match_rules(self, text):
+        # Longest match wins, so "what time is it" beats "time" and "hey,
+        # cpu usage?" resolves to "cpu usage" rather than "chat". On a tie a
+        # keyword beats a prefix, so "run nmap ..." is not a generic "run ".
+        text = text.lower().strip()
+        best, best_len = None, 0
+        if self._keyword_re:
+            for m in self._keyword_re.finditer(text):
+                if len(m.group(0)) > best_len:
+                    best, best_len = self._keywords[m.group(0)], len(m.group(0))
+        for prefix, intent in self._prefixes:
+            if text.startswith(prefix):
+                if len(prefix) > best_len:
+                    best = intent
+                break
+        return best
+
+    def _cache_file(self):
+        key = hashlib.sha1('\n'.join([self.model_name] + self.commands).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'intents-{key}.npy')
+
+    def _intent_embeddings(self, persist=True):
+        if self._embs is None:
+            with self._lock:
+                if self._embs is None:
+                    self._embs = self._load_embeddings(persist)
+        return self._embs
+
+    def _load_embeddings(self, persist=True):
+        # persist=False still uses a cached matrix but never writes one
+        import numpy as np
+        path = self._cache_file()
+        if os.path.exists(path):
+            try:
+                embs = np.load(path)
+                if embs.shape[0] == len(self.commands):
+                    return embs
+            except Exception:
+                pass
+        embs = get_model().encode(self.commands, convert_to_numpy=True, normalize_embeddings=True)
+        if not persist:
+            return embs
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, embs)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+        return embs
+
+    def warm_up(self):
+        self._intent_embeddings()
+
+    def detect(self, user_input, persist=True):
+        intent = self.match_rules(user_input)
+        if intent:
+            return intent, 1.0
+        embs = self._intent_embeddings(persist)
+        emb = get_model().encode(user_input, convert_to_numpy=True, normalize_embeddings=True)
+        scores = embs @ emb
+        best_idx = int(scores.argmax())
+        return self.commands[best_idx], float(scores[best_idx])
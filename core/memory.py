@@ -1,22 +1,119 @@
 import json
 import os
+import threading
 from core import config
 
+
 class Memory:
-    def __init__(self):
-        self.path = config.MEMORY_PATH
+    # memory.json is a snapshot; every change since the last snapshot is an
+    # appended line in memory.json.wal. A snapshot is only ever replaced
+    # atomically, and a torn last journal line is skipped on load, so a crash
+    # mid-write loses at most the command being written. With persist=False
+    # the files are read but never written, so changes last for this run only.
+    def __init__(self, path=None, compact_every=None, fsync=None, persist=True):
+        self.path = path or config.MEMORY_PATH
+        self.journal_path = self.path + '.wal'
+        self.compact_every = compact_every or config.MEMORY_COMPACT_EVERY
+        self.fsync = config.MEMORY_FSYNC if fsync is None else fsync
+        self.persist = persist
+        self._lock = threading.RLock()
+        self._journal_file = None
         self.data = self.load()
+        self.seq = self.data.get('_seq', 0)
+        self.journal = self._read_journal()
+        if self.journal:
+            self.seq = self.journal[-1]['seq']
 
     def load(self):
         if os.path.exists(self.path):
-            with open(self.path, 'r') as f:
-                return json.load(f)
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except ValueError:
+                return {}
         return {}
 
+    def _read_journal(self):
+        # Records already folded into the snapshot (seq <= _seq) are skipped,
+        # which covers a crash between writing the snapshot and truncating.
+        records = []
+        if not os.path.exists(self.journal_path):
+            return records
+        last = self.data.get('_seq', 0)
+        with open(self.journal_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('seq', 0) > last:
+                    records.append(record)
+        return records
+
+    def append(self, record: dict):
+        self.append_many([record])
+
+    def append_many(self, records):
+        # One write (and at most one fsync) for the whole batch
+        if not self.persist or not records:
+            return
+        with self._lock:
+            for record in records:
+                self.seq += 1
+                record['seq'] = self.seq
+            if self._journal_file is None:
+                self._open_journal()
+            self._journal_file.write(''.join(json.dumps(record) + '\n' for record in records))
+            self._journal_file.flush()
+            if self.fsync:
+                os.fsync(self._journal_file.fileno())
+            self.journal.extend(records)
+
+    def _open_journal(self):
+        # A crash can leave a torn last line; cut it off so the next record
+        # starts on a line of its own instead of being glued to it
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'rb+') as f:
+                end = pos = f.seek(0, os.SEEK_END)
+                while pos:
+                    start = max(0, pos - 4096)
+                    f.seek(start)
+                    i = f.read(pos - start).rfind(b'\n')
+                    if i != -1:
+                        pos = start + i + 1
+                        break
+                    pos = start
+                if pos != end:
+                    f.truncate(pos)
+        self._journal_file = open(self.journal_path, 'a')
+
+    def needs_compaction(self):
+        return len(self.journal) >= self.compact_every
+
     def save(self):
-        with open(self.path, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        # Full snapshot: write a temp file, swap it in, then drop the journal
+        if not self.persist:
+            return
+        with self._lock:
+            self.data['_seq'] = self.seq
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            if self._journal_file is not None:
+                self._journal_file.close()
+            self._journal_file = open(self.journal_path, 'w')
+            self.journal = []
 
     def clear(self):
-        self.data = {}
-        self.save() 
\ No newline at end of file
+        with self._lock:
+            self.data = {}
+            self.save()
+
+    def close(self):
+        with self._lock:
+            if self._journal_file is not None:
+                self._journal_file.close()
+                self._journal_file = None
@@ -1,35 +1,251 @@
 import requests
 import json
+import threading
+import time
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from core import config, tracing
+from core.scheduler import PRIORITY_CHAT, Cancelled
 
-OLLAMA_URL = 'http://localhost:11434/api/generate'
+OLLAMA_URL = config.OLLAMA_URL
 
-class OllamaClient:
-    def __init__(self, model='tinyllama'):
+
+class _OllamaBase:
+    # Shared by the sync and async clients: payload building and reuse of
+    # the `context` tokens Ollama returns, so earlier turns are not
+    # re-evaluated on every request. Contexts are kept per conversation (the
+    # most recent OLLAMA_CONVERSATIONS of them), so front-ends sharing one
+    # client don't continue each other's chats. A context is dropped when
+    # the system prompt changes or it grows past max_context tokens.
+    # An optional ResponseCache answers repeated prompts without a request.
+    def __init__(self, model='tinyllama', url=None, keep_alive=None, max_context=None, cache=None):
         self.model = model
+        self.cache = cache
+        self.url = url or config.OLLAMA_URL
+        self.keep_alive = config.OLLAMA_KEEP_ALIVE if keep_alive is None else keep_alive
+        self.max_context = config.OLLAMA_MAX_CONTEXT if max_context is None else max_context
+        self._contexts = OrderedDict()  # conversation -> (context, system)
+        self._context_lock = threading.Lock()
+
+    def reset(self, conversation=None):
+        with self._context_lock:
+            self._contexts.pop(conversation, None)
 
-    def generate(self, prompt, system=None):
+    def _payload(self, prompt, system, conversation=None):
         payload = {
             'model': self.model,
             'prompt': prompt,
         }
+        if self.keep_alive is not None:
+            payload['keep_alive'] = self.keep_alive
+        # Always sent: with only a context Ollama falls back to the
+        # Modelfile's system prompt
         if system:
             payload['system'] = system
+        with self._context_lock:
+            context, context_system = self._contexts.get(conversation, (None, None))
+            if context and context_system == system:
+                payload['context'] = context
+        return payload
+
+    def _remember(self, system, context, conversation=None):
+        with self._context_lock:
+            if context and (not self.max_context or len(context) <= self.max_context):
+                self._contexts[conversation] = (context, system)
+                self._contexts.move_to_end(conversation)
+                while len(self._contexts) > config.OLLAMA_CONVERSATIONS:
+                    self._contexts.popitem(last=False)
+            else:
+                self._contexts.pop(conversation, None)
+
+    def _cached(self, prompt, system, use_cache):
+        if self.cache is None or not use_cache:
+            return None
+        return self.cache.get(self.model, prompt, system)
+
+    def _store(self, prompt, system, parts, started, use_cache):
+        text = ''.join(parts).strip()
+        if self.cache is not None and use_cache and text:
+            self.cache.put(self.model, prompt, system, text, time.perf_counter() - started)
+
+    @staticmethod
+    def _parse(line):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            return None
         try:
-            response = requests.post(OLLAMA_URL, json=payload, timeout=60, stream=True)
+            return json.loads(line)
+        except ValueError:
+            return None
+
+
+class OllamaClient(_OllamaBase):
+    def __init__(self, model='tinyllama', url=None, keep_alive=None, max_context=None, cache=None, session=None, scheduler=None):
+        super().__init__(model, url, keep_alive, max_context, cache)
+        if session is None:
+            # One pooled keep-alive session per client instead of a new TCP
+            # connection for every request
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.OLLAMA_POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.scheduler = scheduler
+
+    def stream(self, prompt, system=None, use_cache=True, priority=PRIORITY_CHAT, cancel=None, conversation=None):
+        # Yields response tokens as Ollama produces them. With a scheduler
+        # the request first waits for a slot by priority. Setting `cancel`
+        # abandons the wait, or stops reading and closes the connection so
+        # the slot (and Ollama) are freed; nothing more is yielded then.
+        cached = self._cached(prompt, system, use_cache)
+        if cached is not None:
+            yield cached
+            return
+        if self.scheduler is None:
+            yield from self._request(prompt, system, use_cache, cancel, conversation)
+            return
+        queued = time.perf_counter()
+        try:
+            with self.scheduler.slot(priority, cancel):
+                tracing.record('ollama.queue', time.perf_counter() - queued)
+                yield from self._request(prompt, system, use_cache, cancel, conversation)
+        except Cancelled:
+            return
+
+    def _request(self, prompt, system, use_cache, cancel, conversation):
+        payload = self._payload(prompt, system, conversation)
+        started = time.perf_counter()
+        parts = []
+        try:
+            with self.session.post(self.url, json=payload, timeout=60, stream=True) as response:
+                response.raise_for_status()
+                got_any = False
+                for line in response.iter_lines():
+                    if cancel is not None and cancel.is_set():
+                        return
+                    obj = self._parse(line)
+                    if obj is None:
+                        continue
+                    token = obj.get('response')
+                    if token:
+                        if not got_any:
+                            tracing.record('ollama.first_token', time.perf_counter() - started)
+                        got_any = True
+                        parts.append(token)
+                        yield token
+                    if obj.get('done'):
+                        self._remember(system, obj.get('context'), conversation)
+                        self._store(prompt, system, parts, started, use_cache)
+                        break
+            if not got_any:
+                yield '[Ollama did not respond]'
+        except Exception as e:
+            self.reset(conversation)
+            yield f"[Ollama error: {e}]"
+        finally:
+            tracing.record('ollama', time.perf_counter() - started)
+
+    def generate(self, prompt, system=None, use_cache=True, priority=PRIORITY_CHAT, cancel=None, conversation=None):
+        return ''.join(self.stream(prompt, system=system, use_cache=use_cache, priority=priority, cancel=cancel, conversation=conversation)).strip()
+
+    def preload(self, timeout=300):
+        # A request without a prompt makes Ollama load the model (and keep
+        # it for keep_alive) without generating anything, so the first real
+        # command doesn't pay for the cold load
+        payload = {'model': self.model}
+        if self.keep_alive is not None:
+            payload['keep_alive'] = self.keep_alive
+        with self.session.post(self.url, json=payload, timeout=timeout, stream=True) as response:
             response.raise_for_status()
-            result = ''
             for line in response.iter_lines():
-                if line:
-                    try:
-                        data = line.decode('utf-8')
-                        if data.startswith('{'):
-                            obj = json.loads(data)
-                            if 'response' in obj:
-                                result += obj['response']
-                    except Exception:
+                obj = self._parse(line)
+                if obj and obj.get('error'):
+                    raise RuntimeError(obj['error'])
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+class AsyncOllamaClient(_OllamaBase):
+    # asyncio counterpart of OllamaClient with the same interface:
+    #   async for token in client.stream(...)
+    #   text = await client.generate(...)
+    # A scheduler shared with threaded clients queues both kinds of request
+    # together; `cancel` may be a threading.Event or an asyncio.Event.
+    def __init__(self, model='tinyllama', url=None, keep_alive=None, max_context=None, cache=None, scheduler=None):
+        super().__init__(model, url, keep_alive, max_context, cache)
+        self._session = None
+        self.scheduler = scheduler
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=config.OLLAMA_POOL_SIZE, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def stream(self, prompt, system=None, use_cache=True, priority=PRIORITY_CHAT, cancel=None, conversation=None):
+        # Same as OllamaClient.stream: waits for a scheduler slot by
+        # priority, and a set `cancel` abandons the wait or the response
+        cached = self._cached(prompt, system, use_cache)
+        if cached is not None:
+            yield cached
+            return
+        if self.scheduler is None:
+            async for token in self._request(prompt, system, use_cache, cancel, conversation):
+                yield token
+            return
+        try:
+            async with self.scheduler.aslot(priority, cancel):
+                async for token in self._request(prompt, system, use_cache, cancel, conversation):
+                    yield token
+        except Cancelled:
+            return
+
+    async def _request(self, prompt, system, use_cache, cancel, conversation):
+        import aiohttp
+        payload = self._payload(prompt, system, conversation)
+        started = time.perf_counter()
+        parts = []
+        try:
+            session = await self._get_session()
+            timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+            async with session.post(self.url, json=payload, timeout=timeout) as response:
+                response.raise_for_status()
+                got_any = False
+                async for line in response.content:
+                    if cancel is not None and cancel.is_set():
+                        return
+                    obj = self._parse(line)
+                    if obj is None:
                         continue
-            if not result:
-                return '[Ollama did not respond]'
-            return result.strip()
+                    token = obj.get('response')
+                    if token:
+                        got_any = True
+                        parts.append(token)
+                        yield token
+                    if obj.get('done'):
+                        self._remember(system, obj.get('context'), conversation)
+                        self._store(prompt, system, parts, started, use_cache)
+                        break
+            if not got_any:
+                yield '[Ollama did not respond]'
         except Exception as e:
-            return f"[Ollama error: {e}]" 
\ No newline at end of file
+            self.reset(conversation)
+            yield f"[Ollama error: {e}]"
+
+    async def generate(self, prompt, system=None, use_cache=True, priority=PRIORITY_CHAT, cancel=None, conversation=None):
+        parts = []
+        async for token in self.stream(prompt, system=system, use_cache=use_cache, priority=priority, cancel=cancel, conversation=conversation):
+            parts.append(token)
+        return ''.join(parts).strip()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,117 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCT = re.compile(r"[^\w\s']")
+
+
+def normalize_prompt(text):
+    # "What's the  weather?" and "what's the weather" share an entry
+    return ' '.join(_PUNCT.sub(' ', text.lower()).split())
+
+
+class ResponseCache:
+    # LRU cache of LLM replies keyed by (model, normalized prompt, system
+    # prompt), with a per-entry TTL. When a path is given, entries survive
+    # restarts: the file is rewritten every `save_every` new entries and on
+    # close(), never on the read path.
+    def __init__(self, max_entries=256, ttl=None, path=None, save_every=20):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.save_every = save_every
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        if path:
+            self._load()
+
+    @staticmethod
+    def key(model, prompt, system=None):
+        return '\x1f'.join([model, normalize_prompt(prompt), system or ''])
+
+    def get(self, model, prompt, system=None):
+        key = self.key(model, prompt, system)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires'] and entry['expires'] < time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry.get('cost', 0.0)
+            return entry['text']
+
+    def put(self, model, prompt, system, text, cost=0.0):
+        key = self.key(model, prompt, system)
+        with self._lock:
+            self._entries[key] = {
+                'text': text,
+                'expires': time.time() + self.ttl if self.ttl else None,
+                'cost': cost,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._unsaved += 1
+        if self.path:
+            self.save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except ValueError:
+            return
+        now = time.time()
+        for key, entry in entries:
+            if not entry.get('expires') or entry['expires'] > now:
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+            self._unsaved = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
+
+    def close(self):
+        if self.path and self._unsaved:
+            self.save()
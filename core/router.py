@@ -0,0 +1,552 @@
+import datetime
+import os
+import re
+import threading
+import time
+from core import config
+from tools import files, monitor, network, processes, system, terminal, users
+
+# A rule match only fires when the whole utterance has the command's shape,
+# so a keyword inside an ordinary question ("what is the time complexity of
+# quicksort", "how do nmap flags work") goes to the LLM instead. Short
+# lead-ins like "what's my", "show me the" or "please" are allowed.
+LEAD = r"(?:(?:what(?:'s| is| are| was| were)|show(?: me)?|tell me|list|check|get|give me)\s+)?(?:(?:the|my|your|current|all)\s+)*"
+METRIC = (r"(?:(?:average|avg|mean|peak|max|maximum|highest)\s+)?{}(?:\s+(?:usage|load|use))?"
+          r"(?:\s+(?:(?:over|in|for|during)\s+the\s+(?:last|past)\s+(?:\d+\s+)?(?:seconds?|minutes?|hours?)|today))?")
+DAY = r"(?:(?:on|last|this)\s+)?(?:yesterday|today|week|\d+ days? ago|monday|tuesday|wednesday|thursday|friday|saturday|sunday)"
+
+
+def _bare(*forms):
+    return LEAD + '(?:' + '|'.join(forms) + r')(?:\s+(?:now|right now))?'
+
+
+# Intents answered straight from tools/ without an LLM round-trip:
+# intent -> (method, exact, form). exact=True routes only fire on a rule
+# match, never on an embedding guess, because they need an argument or act
+# on the system. Destructive intents (reboot, shutdown, delete file, change
+# password, switch user, update) are deliberately absent and still go to
+# the LLM.
+ROUTES = {
+    "uptime": ("_uptime", False, _bare(r"(?:system\s+)?uptime", r"how long (?:have you|has (?:the|this) (?:system|computer|machine)) been running", "how long running")),
+    "cpu usage": ("_cpu_usage", False, LEAD + METRIC.format(r"(?:cpu|processor)")),
+    "ram usage": ("_ram_usage", False, LEAD + METRIC.format(r"(?:ram|memory)")),
+    "disk usage": ("_disk_usage", False, _bare(r"disk(?:\s+(?:usage|space))?")),
+    "public ip": ("_public_ip", False, _bare(r"(?:public\s+)?ip(?:\s+address)?")),
+    "list users": ("_list_users", False, _bare("users", "user accounts")),
+    "list processes": ("_list_processes", False, LEAD + r"(?:(?:what|which)\s+)?(?:(?:top|most)(?:\s+\d+)?\s+|new\s+|running\s+)?processes"
+                       r"(?:\s+(?:are running|running|by (?:cpu|memory|ram)|using the most (?:cpu|memory|ram)|(?:have\s+)?started(?: since the last check)?|named \S+))?"),
+    "time": ("_time", False, _bare(r"time", r"what time is it", r"what's the time")),
+    "help": ("_help", False, _bare(r"help", r"what can you do", r"capabilities")),
+    "show logs": ("_show_logs", False, _bare(r"(?:latest\s+)?(?:logs|log entries)")),
+    "history": ("_history", False, r"what did i do(?:\s+" + DAY + ")?"),
+    "recall": ("_recall", True, r"(?:when did i|did i (?:ever\s+)?ask|have i (?:ever\s+)?asked|what did i ask|what did i say)\b.+"),
+    "ping": ("_ping", True, r"ping\s+[\w.:-]+"),
+    "port scan": ("_port_scan", True, r"(?:port scan|scan ports?)\s+(?:on\s+)?[\w.:/-]+(?:\s+ports\s+[\d,\s-]+)?"),
+    "search file": ("_search_file", True, r"(?:search|find) file\s+\S.*"),
+    "read file": ("_read_file", True, r"read file\s+\S+|(?:read\s+)?" + LEAD + r"(?:first|last|top|bottom)\s+\d+\s+lines?\s+of\s+\S+"),
+    "monitor process": ("_monitor_process", True, r"monitor (?:process|pid)(?:\s+(?:number|id))?\s+\d+"),
+    "list jobs": ("_jobs", False, _bare(r"(?:running\s+)?jobs", r"job status(?:\s+(?:number\s+)?\d+)?", r"status of job\s+(?:number\s+)?\d+")),
+    "kill process": ("_kill_process", True, r"kill (?:process|pid)(?:\s+(?:number|id))?\s+\d+"),
+    "run terminal command": ("_run_command", True, r"(?:run|exec)\s+\S.*"),
+    "run nmap": ("_run_nmap", True, r"(?:run\s+)?nmap\s+\S.*"),
+    "run sqlmap": ("_run_sqlmap", True, r"(?:run\s+)?sqlmap\s+\S.*"),
+    "kill job": ("_kill_job", True, r"(?:kill|cancel|stop) job\s+(?:number\s+)?\d+"),
+    "clear memory": ("_clear_memory", True, r"clear (?:your |the )?memory"),
+}
+FORMS = {intent: re.compile(form) for intent, (_, _, form) in ROUTES.items()}
+
+# These change the system or TOVA itself, or probe other hosts (a port scan
+# may cover up to PORT_SCAN_MAX_HOSTS of them, like nmap): they are asked
+# back first and run only when the next thing said is a yes
+ACTIONS = {"kill process", "run terminal command", "run nmap", "run sqlmap", "port scan", "kill job", "clear memory"}
+CONFIRM = re.compile(r"(?:yes|yeah|yep|sure|ok(?:ay)?|confirm(?:ed)?|do it|go ahead)")
+FILLER = re.compile(r"^(?:(?:hey|ok|okay|so)\s+)?(?:tova\b[,\s]*)?(?:(?:please|can you|could you|would you)\s+)?|\s+please$", re.I)
+
+MAX_SPOKEN_ITEMS = 10
+WINDOW = re.compile(r'\b(?:last|past)\s+(\d+)?\s*(second|minute|hour)s?', re.I)
+SECONDS = {'second': 1, 'minute': 60, 'hour': 3600}
+DAYS_AGO = re.compile(r'\b(\d+) days? ago\b')
+RECALL = re.compile(
+    r'^.*?\b(?:when did i|did i ask|have i asked|what did i ask|what did i say)\b'
+    r'(?:\s+(?:ask|asked|say|said|talk|mention|mentioned|search|me|you))*(?:\s+(?:about|for|to))?\s*', re.I)
+DATE_WORDS = re.compile(
+    r'\b(?:(?:last|on|this)\s+)?(?:yesterday|today|week|\d+ days? ago|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b', re.I)
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+LINES_OF = re.compile(r'\b(first|last|top|bottom)\s+(\d+)\s+lines?\s+of\s+(\S+)', re.I)
+
+
+class RouteStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+        self.total = {}
+        self.worst = {}
+
+    def record(self, route, seconds):
+        with self._lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+            self.total[route] = self.total.get(route, 0.0) + seconds
+            self.worst[route] = max(self.worst.get(route, 0.0), seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            routes = {
+                route: {
+                    "count": n,
+                    "avg_ms": round(self.total[route] / n * 1000, 2),
+                    "max_ms": round(self.worst[route] * 1000, 2),
+                }
+                for route, n in self.counts.items()
+            }
+            total = sum(self.counts.values())
+            llm = self.counts.get("llm", 0)
+        return {
+            "routes": routes,
+            "total": total,
+            "llm_avoided": total - llm,
+            "llm_avoided_ratio": round((total - llm) / total, 3) if total else 0.0,
+        }
+
+
+# Vosk writes numbers as words: "kill process one two three", "the last fifty
+# lines of syslog". Rules and argument parsing see them as digits.
+DIGITS = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine"]
+TEENS = ["ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+TENS = ["twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+NUMBER_WORDS = {**{w: n for n, w in enumerate(DIGITS)}, **{w: n + 10 for n, w in enumerate(TEENS)},
+                **{w: (n + 2) * 10 for n, w in enumerate(TENS)}, "hundred": 100, "thousand": 1000}
+_NUMBER_WORD = '(?:' + '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True)) + ')'
+NUMBER_RUN = re.compile(r'\b' + _NUMBER_WORD + r'(?:(?:(?<=hundred)\s+and|(?<=thousand)\s+and)?[\s-]+' + _NUMBER_WORD + r')*\b', re.I)
+
+
+def _number(words):
+    # "one two three" is read digit by digit (PIDs, job ids); anything
+    # else as a cardinal: "fifty", "twenty five", "one hundred and five"
+    values = [NUMBER_WORDS[w] for w in words]
+    if len(values) > 1 and all(v < 10 for v in values):
+        return ''.join(map(str, values))
+    total = current = 0
+    for v in values:
+        if v == 100:
+            current = (current or 1) * 100
+        elif v == 1000:
+            total, current = total + (current or 1) * 1000, 0
+        else:
+            current += v
+    return str(total + current)
+
+
+def spoken_numbers(text):
+    return NUMBER_RUN.sub(lambda m: _number([w for w in re.split(r'[\s-]+', m.group(0).lower()) if w != 'and']), text)
+
+
+SPOKEN_DAYS_AGO = re.compile(NUMBER_RUN.pattern + r'\s+days?\s+ago\b', re.I)
+
+
+def _spoken_days(text):
+    # Just "three days ago" as digits; a recall topic keeps its own words
+    return SPOKEN_DAYS_AGO.sub(lambda m: spoken_numbers(m.group(0)), text)
+
+
+def _strip(text):
+    # The command without punctuation, "please", "hey tova", ...
+    return FILLER.sub('', text.strip().rstrip('.?!').strip()).strip()
+
+
+def _normalize(text):
+    return _strip(text).lower()
+
+
+def _fits(intent, text):
+    # Whether the utterance has the route's shape, as said or with its
+    # spoken numbers as digits. Only the check and the numbers a route reads
+    # use digits; free-form arguments ("run echo one two") are left alone.
+    text = _normalize(text)
+    return bool(FORMS[intent].fullmatch(text) or FORMS[intent].fullmatch(spoken_numbers(text)))
+
+
+def _after(text, *keywords):
+    # Argument is whatever follows the first keyword found in the utterance
+    lowered = text.lower()
+    for kw in keywords:
+        idx = lowered.find(kw)
+        if idx != -1:
+            return text[idx + len(kw):].strip()
+    return ''
+
+
+def _first_int(text):
+    m = re.search(r'\b(\d+)\b', spoken_numbers(text))
+    return int(m.group(1)) if m else None
+
+
+def _day_range(text):
+    # (start, end, label) for "today", "yesterday", "3 days ago", "this
+    # week", "last week" or a weekday ("last friday" is the most recent
+    # Friday before today); None when the text names no day
+    lowered = _spoken_days(text.lower())
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    day = datetime.timedelta(days=1)
+    if 'yesterday' in lowered:
+        return today - day, today, 'yesterday'
+    if 'today' in lowered:
+        return today, today + day, 'today'
+    m = DAYS_AGO.search(lowered)
+    if m:
+        start = today - int(m.group(1)) * day
+        return start, start + day, m.group(0)
+    monday = today - today.weekday() * day
+    if 'this week' in lowered:
+        return monday, today + day, 'this week'
+    if 'last week' in lowered:
+        return monday - 7 * day, monday, 'last week'
+    for i, name in enumerate(WEEKDAYS):
+        if re.search(rf'\b{name}\b', lowered):
+            start = today - ((today.weekday() - i) % 7 or 7) * day
+            return start, start + day, f"on {name.capitalize()} {start.strftime('%d %B').lstrip('0')}"
+    return None
+
+
+def _describe(record):
+    result = record.get('result') or {}
+    when = datetime.datetime.fromtimestamp(record['ts']).strftime('%H:%M')
+    return f"{when} {record['command']} ({result.get('status', 'ok')})."
+
+
+def _join(items):
+    items = [str(i) for i in items]
+    if len(items) > MAX_SPOKEN_ITEMS:
+        return ', '.join(items[:MAX_SPOKEN_ITEMS]) + f" and {len(items) - MAX_SPOKEN_ITEMS} more"
+    return ', '.join(items)
+
+
+class IntentRouter:
+    def __init__(self, engine, threshold=0.6, actions=True):
+        self.engine = engine
+        self.threshold = threshold
+        self.actions = actions  # False refuses ACTIONS outright, e.g. in batch runs
+        self.stats = RouteStats()
+        self._pending = {}  # conversation -> (intent, command, deadline)
+        self._lock = threading.Lock()
+
+    def can_handle(self, intent, score, command):
+        route = ROUTES.get(intent)
+        if not route:
+            return False
+        if score >= 1.0:
+            return _fits(intent, command)
+        return not route[1] and score >= self.threshold
+
+    def is_complete(self, intent, text):
+        # Argument-free routes: naming the intent is the whole command
+        route = ROUTES.get(intent)
+        return bool(route) and not route[1] and _fits(intent, text)
+
+    def dispatch(self, intent, command):
+        # Returns a result dict, or None when the arguments could not be
+        # extracted and the command should fall through to the LLM.
+        method = ROUTES[intent][0]
+        return getattr(self, method)(command)
+
+    def _ask(self, intent, command, conversation):
+        with self._lock:
+            self._pending[conversation] = (intent, command, time.monotonic() + config.CONFIRM_TIMEOUT)
+        return {"status": "confirm", "message": f"Do you want me to {_strip(command)}? Say yes to go ahead."}
+
+    def confirm(self, command, conversation=None):
+        # (intent, result, action) when this command is the yes to an action
+        # asked about earlier in the same conversation, else None; `action`
+        # is the command that asked for it. Anything else said after the
+        # question drops the pending action.
+        with self._lock:
+            pending = self._pending.pop(conversation, None)
+        if pending is None or time.monotonic() > pending[2] or not CONFIRM.fullmatch(_normalize(command)):
+            return None
+        intent, original, _ = pending
+        start = time.perf_counter()
+        result = self.dispatch(intent, original) or {"status": "error", "message": "Sorry, I couldn't work out what to do."}
+        self.stats.record(intent, time.perf_counter() - start)
+        return intent, result, original
+
+    @staticmethod
+    def _reply(res, text):
+        if res.get("status") != "ok":
+            return {"status": "error", "message": res.get("message") or res.get("error") or "Something went wrong."}
+        return {"status": "ok", "message": text}
+
+    def _uptime(self, command):
+        res = system.uptime()
+        return self._reply(res, f"The system has been {res.get('message', '')}.")
+
+    def _history_query(self, metric, label, command):
+        # "average CPU over the last 5 minutes", "peak RAM today"; None when
+        # the command asks for the current value
+        lowered = command.lower()
+        peak = any(w in lowered for w in ('peak', 'max', 'highest'))
+        if not peak and not any(w in lowered for w in ('average', 'avg', 'mean')):
+            return None
+        m = WINDOW.search(spoken_numbers(command))
+        if m:
+            seconds = int(m.group(1) or 1) * SECONDS[m.group(2).lower()]
+            span = f"over the {m.group(0).lower()}"
+        else:
+            seconds, span = None, 'today'
+        res = monitor.metric_summary(metric, seconds)
+        if peak:
+            return self._reply(res, f"Peak {label} {span} was {res.get('peak')}%.")
+        return self._reply(res, f"Average {label} {span} was {res.get('average')}%.")
+
+    def _cpu_usage(self, command):
+        summary = self._history_query('cpu', 'CPU usage', command)
+        if summary:
+            return summary
+        res = monitor.cpu_usage()
+        return self._reply(res, f"CPU usage is {res.get('cpu')}%.")
+
+    def _ram_usage(self, command):
+        summary = self._history_query('ram', 'RAM usage', command)
+        if summary:
+            return summary
+        res = monitor.ram_usage()
+        return self._reply(res, f"RAM usage is {res.get('ram')}%.")
+
+    def _disk_usage(self, command):
+        res = monitor.disk_usage()
+        return self._reply(res, f"Disk usage is {res.get('disk')}%.")
+
+    def _public_ip(self, command):
+        res = network.public_ip()
+        return self._reply(res, f"Your public IP is {res.get('ip')}.")
+
+    def _list_users(self, command):
+        res = users.list_users()
+        return self._reply(res, f"Users: {_join(res.get('users', []))}.")
+
+    def _list_processes(self, command):
+        lowered = command.lower()
+        if re.search(r'\b(new|started)\b', lowered):
+            res = processes.process_changes()
+            started = sorted({p['name'] for p in res.get('started', [])})
+            exited = sorted({p['name'] for p in res.get('exited', [])})
+            if not started and not exited:
+                return self._reply(res, "No processes started or exited since the last check.")
+            parts = []
+            if started:
+                parts.append(f"{len(res['started'])} started, including {_join(started)}")
+            if exited:
+                parts.append(f"{len(res['exited'])} exited, including {_join(exited)}")
+            return self._reply(res, "Since the last check " + "; ".join(parts) + ".")
+        if re.search(r'\b(top|most)\b', lowered):
+            by = 'memory' if re.search(r'\b(memory|ram)\b', lowered) else 'cpu'
+            res = processes.top_processes(_first_int(command) or 5, by)
+            if by == 'memory':
+                items = [f"{p['name']} {p['memory_rss'] // (1024 * 1024)} MB" for p in res.get('processes', [])]
+            else:
+                items = [f"{p['name']} {p['cpu_percent']}%" for p in res.get('processes', [])]
+            return self._reply(res, f"Top processes by {by}: {_join(items)}.")
+        named = _after(command, 'named')
+        if named:
+            res = processes.find_processes(named)
+            found = res.get('processes', [])
+            pids = [str(p['pid']) for p in found]
+            return self._reply(res, f"{len(found)} processes named {named}: {_join(pids)}." if found else f"No process named {named} is running.")
+        res = processes.list_processes()
+        names = sorted({p.get('name') for p in res.get('processes', []) if p.get('name')})
+        return self._reply(res, f"{len(res.get('processes', []))} processes running, including {_join(names)}.")
+
+    def _time(self, command):
+        return {"status": "ok", "message": f"It's {datetime.datetime.now().strftime('%H:%M')}."}
+
+    def _help(self, command):
+        from core.engine import EXAMPLES
+        return {"status": "ok", "message": "Here are some things I can do: " + "; ".join(EXAMPLES)}
+
+    def _show_logs(self, command):
+        midnight = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        records = self.engine.action_log.query(start=midnight.timestamp(), limit=5)
+        if not records:
+            return {"status": "ok", "message": "Nothing has been logged today."}
+        return {"status": "ok", "message": "Latest log entries: " + " ".join(_describe(r) for r in records)}
+
+    def _history(self, command):
+        span = _day_range(command)
+        if span:
+            start, end, label = span
+            records = self.engine.action_log.query(start=start.timestamp(), end=end.timestamp())
+            if not records:
+                return {"status": "ok", "message": f"I have nothing logged for {label}."}
+            commands = [r['command'] for r in records]
+            return {"status": "ok", "message": f"{label[0].upper()}{label[1:]} you asked me {len(commands)} things: {_join(commands)}."}
+        recent = [cmd for cmd, _ in list(self.engine.brain.recent_commands)[-5:]]
+        if not recent:
+            return {"status": "ok", "message": "You haven't asked me anything yet."}
+        return {"status": "ok", "message": f"Your recent commands were: {_join(recent)}."}
+
+    def _recall(self, command):
+        # "when did I ask about backups", "did I say anything about nmap last week"
+        history = self.engine.history
+        if history is None:
+            return None
+        topic = DATE_WORDS.sub(' ', _spoken_days(RECALL.sub('', command, count=1))).strip(' ?.!')
+        if not topic:
+            return None
+        span = _day_range(command)
+        start, end = (span[0].timestamp(), span[1].timestamp()) if span else (None, None)
+        # Earlier recall questions look just like the topic; leave them out
+        hits = [t for t in history.search(topic, k=8, start=start, end=end) if not RECALL.match(t['command'])][:3]
+        if not hits:
+            label = f" {span[2]}" if span else ""
+            return {"status": "ok", "message": f"I can't find anything about {topic}{label}."}
+        said = []
+        for turn in hits:
+            when = datetime.datetime.fromtimestamp(turn['ts'])
+            said.append(f"on {when.strftime('%A %d %B').replace(' 0', ' ')} at {when.strftime('%H:%M')} you asked: {turn['command']}")
+        return {"status": "ok", "message": "; ".join(said) + "."}
+
+    def _ping(self, command):
+        host = _after(command, 'ping')
+        if not host:
+            return None
+        res = network.ping(host.split()[0])
+        return self._reply(res, res.get('output', ''))
+
+    def _port_scan(self, command):
+        # "scan ports on <host> [ports 20-25,80]" / "port scan <host>"
+        arg = _after(command, 'scan ports', 'scan port', 'port scan')
+        target, _, ports = arg.partition(' ports ')
+        target = target.strip()
+        if target.lower().startswith('on '):
+            target = target[3:].strip()
+        if not target:
+            return None
+        res = network.port_scan(target.split()[0], ports.replace(' ', '') or None)
+        if res.get("status") == "ok" and "hosts" in res:
+            found = [f"{h} {_join(p)}" for h, p in res["hosts"].items() if p]
+            return {"status": "ok", "message": "Open ports: " + ("; ".join(found) if found else "none") + "."}
+        open_ports = res.get('open_ports', [])
+        return self._reply(res, f"Open ports on {target.split()[0]}: {_join(open_ports)}." if open_ports else f"No open ports found on {target.split()[0]}.")
+
+    def _search_file(self, command):
+        arg = _after(command, 'search file', 'find file')
+        if not arg:
+            return None
+        pattern, _, directory = arg.partition(' in ')
+        pattern = pattern.strip()
+        mode = 'glob' if any(c in pattern for c in '*?[') else 'substring'
+        res = files.search_files(directory.strip() or os.path.expanduser('~'), pattern, mode=mode, limit=MAX_SPOKEN_ITEMS + 1, indexed=self.engine.persist)
+        matches = res.get('matches', [])
+        if res.get("status") == "ok" and not matches:
+            return {"status": "ok", "message": f"No files matching {pattern}."}
+        if len(matches) > MAX_SPOKEN_ITEMS:
+            return self._reply(res, f"Found more than {MAX_SPOKEN_ITEMS} files, including {_join(matches[:MAX_SPOKEN_ITEMS])}.")
+        return self._reply(res, f"Found {len(matches)} files: {_join(matches)}.")
+
+    def _read_file(self, command):
+        # "read file <path>" or "show the last 50 lines of <path>"
+        m = LINES_OF.search(spoken_numbers(command))
+        # The path as said, not with its number words turned into digits
+        path = _after(command, 'lines of', 'line of').split(' ')[0] if m else _after(command, 'read file')
+        if not path:
+            return None
+        path = os.path.expanduser(path)
+        if not os.path.exists(path) and os.path.exists(os.path.join('/var/log', path)):
+            path = os.path.join('/var/log', path)  # "syslog", "auth.log", ...
+        if m and m.group(1).lower() in ('last', 'bottom'):
+            res = files.read_file(path, tail=int(m.group(2)))
+        elif m:
+            res = files.read_file(path, head=int(m.group(2)))
+        else:
+            res = files.read_file(path)
+        return self._reply(res, res.get('content', ''))
+
+    def _kill_process(self, command):
+        pid = _first_int(command)
+        if pid is None:
+            return None
+        res = processes.kill_process(pid)
+        return self._reply(res, res.get('message', ''))
+
+    def _monitor_process(self, command):
+        pid = _first_int(command)
+        if pid is None:
+            return None
+        res = processes.monitor_process(pid)
+        info = res.get('info', {})
+        mem = info.get('memory_rss')
+        rss = f", using {mem // (1024 * 1024)} MB" if mem is not None else ""
+        return self._reply(res, f"{info.get('name')} ({info.get('pid')}) is at {info.get('cpu_percent')}% CPU{rss}.")
+
+    def _run(self, cmd):
+        # Short commands answer inline; anything still running after the
+        # foreground wait (and scans, always) carries on as a background job
+        res = terminal.start_job(cmd, timeout=config.TERMINAL_JOB_TIMEOUT)
+        if res.get('status') != 'ok':
+            return self._reply(res, '')
+        job = terminal.get_manager().get(res['job'])
+        background = cmd.split()[0] in config.TERMINAL_BACKGROUND_COMMANDS
+        if background or not job.wait(config.TERMINAL_FOREGROUND_WAIT):
+            return {"status": "ok", "message": f"Started job {job.id}. Ask for the status of job {job.id}, or say kill job {job.id}."}
+        info = job.to_dict()
+        output = info['output'] or info['error'] or 'Done, no output.'
+        return {"status": "ok" if info['state'] == 'done' else "error", "message": output}
+
+    def _jobs(self, command):
+        job_id = _first_int(command)
+        if job_id is not None:
+            res = terminal.job_status(job_id, tail=5)
+            job = res.get('job', {})
+            last = job.get('output') or job.get('error') or 'no output yet'
+            return self._reply(res, f"Job {job_id} ({job.get('command')}) is {job.get('state')} after {job.get('runtime')} seconds. Last output: {last}")
+        res = terminal.list_jobs()
+        jobs = res.get('jobs', [])
+        if not jobs:
+            return self._reply(res, "No jobs.")
+        return self._reply(res, "Jobs: " + _join(f"{j['id']} {j['command']} {j['state']}" for j in jobs) + ".")
+
+    def _kill_job(self, command):
+        job_id = _first_int(command)
+        if job_id is None:
+            return None
+        res = terminal.kill_job(job_id)
+        return self._reply(res, res.get('message', ''))
+
+    def _run_command(self, command):
+        cmd = _after(command, 'run ', 'exec ')
+        return self._run(cmd) if cmd else None
+
+    def _run_nmap(self, command):
+        args = _after(command, 'nmap')
+        return self._run(f"nmap {args}") if args else None
+
+    def _run_sqlmap(self, command):
+        args = _after(command, 'sqlmap')
+        return self._run(f"sqlmap {args}") if args else None
+
+    def _clear_memory(self, command):
+        from core.brain import Brain
+        # Under the engine's record lock, so a command finishing meanwhile
+        # is not recorded into the brain being thrown away
+        with self.engine._record_lock:
+            self.engine.memory.clear()
+            self.engine.brain = Brain(memory=self.engine.memory)
+            # Past turns would otherwise still come back through recall, or
+            # as cached replies to them
+            if self.engine.history:
+                self.engine.history.clear()
+        if self.engine.ollama.cache is not None:
+            self.engine.ollama.cache.clear()
+        return {"status": "ok", "message": "Memory cleared."}
+
+    def handle(self, intent, score, command, conversation=None):
+        # Returns the tool result, or None when the command belongs to the LLM
+        if not self.can_handle(intent, score, command):
+            return None
+        if intent in ACTIONS:
+            if not self.actions:
+                return {"status": "error", "message": "I can't do that here."}
+            return self._ask(intent, command, conversation)
+        start = time.perf_counter()
+        result = self.dispatch(intent, command)
+        if result is not None:
+            self.stats.record(intent, time.perf_counter() - start)
+        return result
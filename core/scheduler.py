@@ -0,0 +1,93 @@
+import asyncio
+import heapq
+import itertools
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+# Lower runs first. Commands the router could not answer but that still look
+# like a task go ahead of open-ended chat.
+PRIORITY_COMMAND = 0
+PRIORITY_CHAT = 1
+
+
+class Cancelled(Exception):
+    pass
+
+
+class LLMScheduler:
+    # Admission control for LLM requests: at most `concurrency` run at once
+    # and waiting requests are admitted by priority, then arrival order. A
+    # waiter whose cancel event is set leaves the queue without ever taking
+    # a slot; a running request gives its slot back as soon as its `with`
+    # block exits.
+    def __init__(self, concurrency=1):
+        self.concurrency = concurrency
+        self.active = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_CHAT, cancel=None):
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while not self._admit(ticket):
+                if cancel is not None and cancel.is_set():
+                    self._leave(ticket)
+                    raise Cancelled()
+                # Cancel events can't notify the condition, so poll for them
+                self._cond.wait(0.1 if cancel is not None else None)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self, priority=PRIORITY_CHAT, cancel=None, poll=0.02):
+        # slot() for asyncio code, in the same queue as threaded callers. It
+        # polls instead of waiting on the condition so the event loop is
+        # never blocked; a cancelled task leaves the queue like a cancel.
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+        try:
+            while True:
+                with self._cond:
+                    if self._admit(ticket):
+                        break
+                if cancel is not None and cancel.is_set():
+                    raise Cancelled()
+                await asyncio.sleep(poll)
+        except BaseException:
+            with self._cond:
+                self._leave(ticket)
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _admit(self, ticket):
+        # Under _cond: take a slot if `ticket` is first in line and one is free
+        if self.active < self.concurrency and self._waiting[0] == ticket:
+            heapq.heappop(self._waiting)
+            self.active += 1
+            self._cond.notify_all()  # The next in line may fit too
+            return True
+        return False
+
+    def _leave(self, ticket):
+        # Under _cond: give up waiting without taking a slot
+        self._waiting.remove(ticket)
+        heapq.heapify(self._waiting)
+        self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"active": self.active, "waiting": len(self._waiting), "concurrency": self.concurrency}
@@ -0,0 +1,350 @@
+# Local daemon: one TovaEngine (and one set of models) shared by every
+# front-end. Clients connect to a Unix socket, or optionally a localhost TCP
+# port, and speak newline-delimited JSON:
+#
+#   -> {"auth": "<token>"}   <- {"auth": true}        (TCP only, must come first)
+#   -> {"id": 1, "command": "cpu usage"}
+#   <- {"id": 1, "token": "Sure! "}                  (streamed pieces)
+#   <- {"id": 1, "done": true, "message": "...", "cancelled": false}
+#   -> {"cancel": 1}                                  (stop request 1)
+#   -> {"stats": true}   <- {"stats": {...}}
+#
+# Several requests may be in flight on one connection. Closing the
+# connection cancels whatever it still had running. Any local user can reach
+# the TCP port, so it only serves clients that know the token in
+# DAEMON_TOKEN_PATH; the Unix socket is only reachable by its owner.
+#
+#   python -m core.server                      run the daemon
+#   python -m core.server --ask "cpu usage"    send one command to it
+import argparse
+import asyncio
+import functools
+import hmac
+import itertools
+import json
+import os
+import secrets
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core import config, tracing
+
+
+def get_token(create=False, path=None):
+    # The shared secret for TCP clients; the daemon creates it on first start
+    path = path or config.DAEMON_TOKEN_PATH
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(secrets.token_hex(32))
+    with open(path, 'r') as f:
+        return f.read().strip()
+
+
+class TovaServer:
+    # Commands are routed, and tool commands answered, on one thread pool.
+    # Commands that go to the LLM continue on a second pool, whose threads
+    # may wait in the engine's LLM queue, so tool commands never queue
+    # behind chats.
+    def __init__(self, engine, socket_path=None, port=None, workers=None, startup=None, llm_workers=None):
+        self.engine = engine
+        self.startup = startup
+        self.socket_path = socket_path or config.DAEMON_SOCKET
+        self.port = config.DAEMON_PORT if port is None else port
+        self.executor = ThreadPoolExecutor(max_workers=workers or config.DAEMON_WORKERS, thread_name_prefix='tova-cmd')
+        self.llm_executor = ThreadPoolExecutor(max_workers=llm_workers or config.DAEMON_LLM_WORKERS, thread_name_prefix='tova-llm')
+        self.servers = []
+        self.clients = {}
+        self._conversations = itertools.count(1)
+        self.token = None
+        self.loop = None
+        self._stopped = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # Left over from a crash
+        server = await asyncio.start_unix_server(self._client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self.servers.append(server)
+        if self.port:
+            self.token = get_token(create=True)
+            client = functools.partial(self._client, auth=True)
+            self.servers.append(await asyncio.start_server(client, host='127.0.0.1', port=self.port))
+        print(f"[TOVA] Daemon listening on {self.socket_path}" + (f" and 127.0.0.1:{self.port}" if self.port else ""))
+
+    async def serve(self):
+        await self.start()
+        await self._stopped.wait()
+        for server in self.servers:
+            server.close()
+        # Hang up on connected clients; their handlers cancel what's running
+        for writer in list(self.clients.values()):
+            writer.close()
+        await asyncio.gather(*self.clients, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.llm_executor.shutdown(wait=False, cancel_futures=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def stop(self):
+        # Safe to call from any thread
+        if self.loop and self._stopped:
+            self.loop.call_soon_threadsafe(self._stopped.set)
+
+    def serve_in_thread(self):
+        # For main.py: serve alongside the voice front-end from its engine
+        thread = threading.Thread(target=lambda: asyncio.run(self.serve()), daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        stats = {"clients": len(self.clients), "llm_queue": self.engine.llm_queue.stats(), "routes": self.engine.route_stats.summary()}
+        if self.startup:
+            stats["startup"] = self.startup.status()
+        return stats
+
+    async def _authenticate(self, reader, writer):
+        try:
+            msg = json.loads(await reader.readline())
+            token = msg.get('auth') if isinstance(msg, dict) else None
+        except ValueError:
+            token = None
+        ok = isinstance(token, str) and hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+        writer.write((json.dumps({"auth": True} if ok else {"error": "unauthorized"}) + '\n').encode('utf-8'))
+        await writer.drain()
+        return ok
+
+    async def _client(self, reader, writer, auth=False):
+        if auth:
+            try:
+                ok = await self._authenticate(reader, writer)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                ok = False
+            if not ok:
+                writer.close()
+                return
+        self.clients[asyncio.current_task()] = writer
+        # Each connection is its own conversation (LLM context, confirmations)
+        conversation = f"client-{next(self._conversations)}"
+        running = {}
+        lock = asyncio.Lock()
+
+        async def send(obj):
+            async with lock:
+                writer.write((json.dumps(obj) + '\n').encode('utf-8'))
+                await writer.drain()
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Past the stream's line limit; what was read is dropped
+                    await send({"error": "message too long"})
+                    continue
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    await send({"error": "invalid JSON"})
+                    continue
+                if not isinstance(msg, dict):
+                    await send({"error": "expected a JSON object"})
+                    continue
+                try:
+                    await self._handle(msg, running, send, conversation)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # A bad field in one message doesn't end the connection
+                    await send({"id": msg.get('id'), "error": str(e) or type(e).__name__})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            # The client is gone: free its LLM slots and queue places
+            for task, cancel in list(running.values()):
+                cancel.set()
+            await asyncio.gather(*(task for task, _ in list(running.values())), return_exceptions=True)
+            self.clients.pop(asyncio.current_task(), None)
+            self.engine.ollama.reset(conversation)
+            writer.close()
+
+    async def _handle(self, msg, running, send, conversation):
+        if 'cancel' in msg:
+            entry = running.get(msg['cancel'])
+            if entry:
+                entry[1].set()
+        elif msg.get('stats'):
+            await send({"stats": self.stats()})
+        elif msg.get('command'):
+            rid = msg.get('id')
+            if not isinstance(msg['command'], str):
+                raise ValueError("command must be a string")
+            if rid is not None and not isinstance(rid, (str, int, float)):
+                raise ValueError("id must be a string or number")
+            cancel = threading.Event()
+            task = asyncio.create_task(self._run(rid, msg, cancel, send, conversation))
+            running[rid] = (task, cancel)
+            task.add_done_callback(lambda t, rid=rid: running.pop(rid, None))
+        else:
+            await send({"id": msg.get('id'), "error": "expected command, cancel or stats"})
+
+    def _route(self, command, conversation):
+        # On a command thread: the router, and the tool if one answers
+        trace = tracing.begin(command)
+        try:
+            intent, result, command = self.engine.route_command(command, conversation)
+        except BaseException:
+            tracing.finish(trace)
+            raise
+        tracing.detach()
+        return intent, result, command, trace
+
+    def _record(self, command, result, trace):
+        tracing.attach(trace)
+        try:
+            self.engine.record(command, result)
+        finally:
+            tracing.finish(trace)
+
+    async def _run(self, rid, msg, cancel, send, conversation):
+        loop = asyncio.get_running_loop()
+        stream = msg.get('stream', True)
+        try:
+            command = msg['command'].strip()
+            intent, result, command, trace = await loop.run_in_executor(self.executor, self._route, command, conversation)
+            if result is None:
+                await self._chat(rid, command, intent, trace, cancel, send, stream, conversation)
+                return
+            try:
+                if stream:
+                    await send({"id": rid, "token": result["message"]})
+                await send({"id": rid, "done": True, "message": result["message"], "cancelled": False})
+            finally:
+                await loop.run_in_executor(self.executor, self._record, command, result, trace)
+        except (ConnectionError, RuntimeError):
+            cancel.set()  # Client went away mid-reply
+        except Exception as e:
+            await send({"id": rid, "done": True, "error": str(e) or type(e).__name__})
+
+    async def _chat(self, rid, command, intent, trace, cancel, send, stream, conversation):
+        loop = asyncio.get_running_loop()
+        pieces = asyncio.Queue()
+
+        def work():
+            tracing.attach(trace)
+            tokens = self.engine.stream_llm(command, intent, cancel=cancel, conversation=conversation)
+            try:
+                for piece in tokens:
+                    if cancel.is_set():
+                        break
+                    loop.call_soon_threadsafe(pieces.put_nowait, ('token', piece))
+                loop.call_soon_threadsafe(pieces.put_nowait, ('done', None))
+            except Exception as e:
+                loop.call_soon_threadsafe(pieces.put_nowait, ('error', str(e)))
+            finally:
+                tokens.close()
+                tracing.finish(trace)
+
+        future = loop.run_in_executor(self.llm_executor, work)
+        parts = []
+        try:
+            while True:
+                kind, value = await pieces.get()
+                if kind == 'token':
+                    parts.append(value)
+                    if stream:
+                        await send({"id": rid, "token": value})
+                elif kind == 'done':
+                    await send({"id": rid, "done": True, "message": ''.join(parts).strip(), "cancelled": cancel.is_set()})
+                    break
+                else:
+                    await send({"id": rid, "done": True, "error": value})
+                    break
+        except (ConnectionError, RuntimeError):
+            cancel.set()  # Client went away mid-reply
+        await future
+
+
+class TovaClient:
+    # Blocking client for scripts and simple front-ends; one request at a time.
+    # Over TCP it authenticates with `token`, by default the daemon's own.
+    def __init__(self, socket_path=None, port=None, timeout=None, token=None):
+        if port:
+            self.sock = socket.create_connection(('127.0.0.1', port), timeout=timeout)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(socket_path or config.DAEMON_SOCKET)
+        self.file = self.sock.makefile('rwb')
+        self._ids = 0
+        if port:
+            self._send({"auth": token or get_token()})
+            if not self._recv().get('auth'):
+                self.close()
+                raise PermissionError("daemon refused the token")
+
+    def _send(self, obj):
+        self.file.write((json.dumps(obj) + '\n').encode('utf-8'))
+        self.file.flush()
+
+    def _recv(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection")
+        return json.loads(line)
+
+    def ask(self, command, on_token=None) -> dict:
+        self._ids += 1
+        rid = self._ids
+        self._send({"id": rid, "command": command, "stream": on_token is not None})
+        while True:
+            msg = self._recv()
+            if msg.get('id') != rid:
+                continue
+            if 'token' in msg:
+                on_token(msg['token'])
+            elif msg.get('done'):
+                return msg
+
+    def stats(self) -> dict:
+        self._send({"stats": True})
+        while True:
+            msg = self._recv()
+            if 'stats' in msg:
+                return msg['stats']
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve TovaEngine to local clients, or talk to a running daemon")
+    parser.add_argument('--socket', help=f"Unix socket path (default {config.DAEMON_SOCKET})")
+    parser.add_argument('--port', type=int, help="Also listen on this 127.0.0.1 port (clients need the token in DAEMON_TOKEN_PATH)")
+    parser.add_argument('--ask', help="Send one command to a running daemon and print the reply")
+    args = parser.parse_args()
+    if args.ask:
+        client = TovaClient(args.socket, args.port)
+        client.ask(args.ask, on_token=lambda t: print(t, end='', flush=True))
+        print()
+        client.close()
+        return
+    from core.engine import TovaEngine
+    engine = TovaEngine()
+    server = TovaServer(engine, args.socket, args.port)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from collections import Counter, defaultdict
+from rapidfuzz import fuzz, process
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def _trigrams(text):
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SkillIndex:
+    # Learned skills with their inputs normalized once, up front. Matching is
+    # a single rapidfuzz extractOne call over all inputs; past
+    # prefilter_above skills a trigram index first narrows the field to the
+    # `candidates` inputs sharing the most trigrams with the query.
+    def __init__(self, skills=None, prefilter_above=None, candidates=512, rare_grams=6):
+        self.skills = []
+        self.keys = []
+        self.prefilter_above = prefilter_above
+        self.candidates = candidates
+        self.rare_grams = rare_grams
+        self._grams = defaultdict(list)
+        for skill in skills or []:
+            self.add(skill)
+
+    def __len__(self):
+        return len(self.skills)
+
+    def add(self, skill):
+        idx = len(self.skills)
+        key = normalize(skill['input'])
+        self.skills.append(skill)
+        self.keys.append(key)
+        for gram in _trigrams(key):
+            self._grams[gram].append(idx)
+
+    def _choices(self, query):
+        if self.prefilter_above is None or len(self.keys) <= self.prefilter_above:
+            return self.keys
+        # Count hits over the query's rarest trigrams only: common grams
+        # (" th", "the") match everything and just cost time. Grams no skill
+        # has (filler such as "could you quickly") say nothing and are
+        # skipped; a query made only of those gets the full scan.
+        postings = sorted((p for p in map(self._grams.get, _trigrams(query)) if p), key=len)
+        hits = Counter()
+        budget = self.candidates * 8
+        for n, posting in enumerate(postings):
+            # At least rare_grams of them, then as many as stay cheap
+            if n >= self.rare_grams and len(posting) > budget:
+                break
+            budget -= len(posting)
+            hits.update(posting)
+        if not hits:
+            return self.keys
+        # In skill order, so ties go to the same skill as without the prefilter
+        best = sorted(idx for idx, _ in hits.most_common(self.candidates))
+        return {idx: self.keys[idx] for idx in best}
+
+    def match(self, user_input, threshold=80):
+        if not self.keys:
+            return None
+        best = process.extractOne(
+            normalize(user_input), self._choices(normalize(user_input)),
+            scorer=fuzz.partial_ratio, processor=None, score_cutoff=threshold,
+        )
+        if best is None:
+            return None
+        return self.skills[best[2]]
@@ -0,0 +1,110 @@
+import threading
+import time
+
+
+class Component:
+    def __init__(self, name, target, required, after):
+        self.name = name
+        self.target = target
+        self.required = required
+        self.after = list(after)
+        self.state = 'pending'
+        self.value = None
+        self.error = None
+        self.seconds = None
+        self.done = threading.Event()
+
+
+class Startup:
+    # Starts independent pieces (engine, speech models, TTS, LLM preload) at
+    # the same time on their own threads instead of one after another. A
+    # component can wait for others with `after`; its timing then starts
+    # when those are done. Callers block only on the pieces they need via
+    # wait(), and status() shows how far along everything is.
+    def __init__(self):
+        self.components = {}
+        self.started = None
+        self._lock = threading.Lock()
+
+    def add(self, name, target, required=True, after=()):
+        component = Component(name, target, required, after)
+        with self._lock:
+            self.components[name] = component
+            running = self.started is not None
+        if running:
+            self._spawn(component)
+        return self
+
+    def start(self):
+        with self._lock:
+            self.started = time.perf_counter()
+            components = list(self.components.values())
+        for component in components:
+            self._spawn(component)
+        return self
+
+    def _spawn(self, component):
+        threading.Thread(target=self._run, args=(component,), name=f'startup-{component.name}', daemon=True).start()
+
+    def _run(self, component):
+        for name in component.after:
+            dependency = self.components[name]
+            dependency.done.wait()
+            if dependency.state != 'ready':
+                component.state, component.error = 'skipped', f"{name} failed"
+                component.done.set()
+                return
+        component.state = 'loading'
+        start = time.perf_counter()
+        try:
+            component.value = component.target()
+            component.state = 'ready'
+        except Exception as e:
+            component.state, component.error = 'failed', str(e)
+            print(f"[TOVA] Startup: {component.name} failed: {e}")
+        component.seconds = time.perf_counter() - start
+        component.done.set()
+
+    def wait(self, name, timeout=None):
+        # The component's result, once it is ready
+        component = self.components[name]
+        if not component.done.wait(timeout):
+            raise TimeoutError(f"{name} is still {component.state}")
+        if component.state != 'ready':
+            raise RuntimeError(f"{name} {component.state}: {component.error}")
+        return component.value
+
+    def ready(self, name):
+        component = self.components.get(name)
+        return component is not None and component.state == 'ready'
+
+    def wait_required(self, timeout=None):
+        # Seconds from start() until every required component was ready
+        for component in [c for c in list(self.components.values()) if c.required]:
+            self.wait(component.name, timeout)
+        return time.perf_counter() - self.started
+
+    def wait_all(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for component in list(self.components.values()):
+            component.done.wait(None if deadline is None else max(0, deadline - time.monotonic()))
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "state": c.state,
+                "required": c.required,
+                "seconds": round(c.seconds, 3) if c.seconds is not None else None,
+                "error": c.error,
+            }
+            for name, c in list(self.components.items())
+        }
+
+    def report(self):
+        parts = []
+        for name, c in list(self.components.items()):
+            if c.state == 'ready':
+                parts.append(f"{name} {c.seconds:.2f}s")
+            else:
+                parts.append(f"{name} {c.state}")
+        return ", ".join(parts)
@@ -0,0 +1,352 @@
+import bisect
+import cProfile
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from core import config
+
+# Upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'trace', 'start')
+
+    def __init__(self, tracer, name, trace):
+        self.tracer = tracer
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, time.perf_counter() - self.start, self.trace, self.start)
+        return False
+
+
+class Histogram:
+    # Cumulative bucket counts since startup (what Prometheus expects) plus
+    # the last `window` samples for rolling percentiles
+    def __init__(self, window):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def percentile(self, pct):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Trace:
+    # Stage timings for one command. Spans may be added from several
+    # threads (engine, speech), each of which attach()es the trace.
+    def __init__(self, trace_id, command):
+        self.id = trace_id
+        self.command = command
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.profile = None
+        self.profile_thread = None
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, start=None):
+        if start is None:
+            start = time.perf_counter() - seconds
+        span = {'name': name, 'offset_ms': round((start - self.t0) * 1000, 2), 'ms': round(seconds * 1000, 2)}
+        with self._lock:
+            self.spans.append(span)
+
+
+class Tracer:
+    # Collects spans into per-stage histograms and per-command traces.
+    # Finished traces are appended to a JSON-lines file; histograms are
+    # exported in Prometheus text format to a file and/or a local HTTP
+    # endpoint. Commands slower than slow_ms get a cProfile dump of the
+    # thread that handled them.
+    def __init__(self, path=None, prometheus_path=None, http_port=None, slow_ms=None, window=None):
+        self.path = path or config.TRACE_PATH
+        self.prometheus_path = config.TRACE_PROMETHEUS_PATH if prometheus_path is None else prometheus_path
+        self.slow_ms = config.TRACE_SLOW_MS if slow_ms is None else slow_ms
+        self.window = window or config.TRACE_WINDOW
+        self.histograms = {}
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._file = None
+        self._exported_at = 0.0
+        self._server = None
+        http_port = config.TRACE_HTTP_PORT if http_port is None else http_port
+        if http_port:
+            self.serve(http_port)
+
+    # Recording
+
+    def current(self):
+        return getattr(self._local, 'trace', None)
+
+    def span(self, name):
+        return _Span(self, name, self.current())
+
+    def record(self, name, seconds, trace=None, start=None):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.window)
+            histogram.add(seconds)
+        if trace is not None:
+            trace.add(name, seconds, start)
+
+    def handoff(self, command, name, seconds):
+        # For stages measured before the command's trace exists (speech
+        # recognition): recorded now, attached when `command` begins
+        self.record(name, seconds)
+        with self._lock:
+            self._pending[command] = (name, seconds, time.perf_counter())
+            while len(self._pending) > 32:
+                del self._pending[next(iter(self._pending))]
+
+    # Trace lifecycle
+
+    def begin(self, command):
+        trace = Trace(next(self._ids), command)
+        with self._lock:
+            pending = self._pending.pop(command, None)
+        if pending:
+            name, seconds, ended = pending
+            trace.add(name, seconds, ended - seconds)
+        if self.slow_ms is not None:
+            try:
+                profile = cProfile.Profile()
+                profile.enable()
+                trace.profile, trace.profile_thread = profile, threading.get_ident()
+            except ValueError:
+                pass  # Another profiler is active
+        self._local.trace = trace
+        return trace
+
+    def attach(self, trace):
+        self._local.trace = trace
+
+    def detach(self):
+        # cProfile only follows the thread that enabled it, so the profile
+        # is stopped when that thread lets go of the trace
+        trace = self.current()
+        self._local.trace = None
+        if trace is not None and trace.profile_thread == threading.get_ident():
+            trace.profile.disable()
+            trace.profile_thread = None
+
+    def finish(self, trace):
+        if self.current() is trace:
+            self.detach()
+        total = time.perf_counter() - trace.t0
+        self.record('command', total)
+        record = {
+            'id': trace.id,
+            'time': trace.started,
+            'command': trace.command,
+            'total_ms': round(total * 1000, 2),
+            'spans': sorted(trace.spans, key=lambda s: s['offset_ms']),
+        }
+        if trace.profile is not None and trace.profile_thread is None and total * 1000 >= self.slow_ms:
+            os.makedirs(config.TRACE_PROFILE_PATH, exist_ok=True)
+            path = os.path.join(config.TRACE_PROFILE_PATH, f'{int(trace.started)}-{trace.id}.prof')
+            trace.profile.dump_stats(path)
+            record['profile'] = path
+        self._write(record)
+        if self.prometheus_path and time.monotonic() - self._exported_at >= config.TRACE_PROMETHEUS_EVERY:
+            self.export()
+        return record
+
+    # Output
+
+    def _write(self, record):
+        try:
+            with self._file_lock:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    self._file = open(self.path, 'a')
+                self._file.write(json.dumps(record) + '\n')
+                self._file.flush()
+        except OSError as e:
+            print(f"[TOVA] Could not write trace: {e}")
+
+    def summary(self):
+        with self._lock:
+            return {
+                name: {
+                    'count': h.count,
+                    'mean_ms': round(h.sum / h.count * 1000, 2),
+                    'p50_ms': round(h.percentile(50) * 1000, 2),
+                    'p95_ms': round(h.percentile(95) * 1000, 2),
+                }
+                for name, h in self.histograms.items()
+            }
+
+    def prometheus(self):
+        lines = [
+            '# HELP tova_stage_seconds Time spent per pipeline stage.',
+            '# TYPE tova_stage_seconds histogram',
+        ]
+        rolling = []
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), h.counts):
+                    cumulative += count
+                    lines.append(f'tova_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'tova_stage_seconds_sum{{stage="{name}"}} {h.sum:.6f}')
+                lines.append(f'tova_stage_seconds_count{{stage="{name}"}} {h.count}')
+                for q in (50, 95):
+                    rolling.append(f'tova_stage_recent_seconds{{stage="{name}",quantile="{q / 100:g}"}} {h.percentile(q):.6f}')
+        lines.append(f'# HELP tova_stage_recent_seconds Percentiles over the last {self.window} samples per stage.')
+        lines.append('# TYPE tova_stage_recent_seconds gauge')
+        return '\n'.join(lines + rolling) + '\n'
+
+    def export(self):
+        self._exported_at = time.monotonic()
+        tmp = self.prometheus_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.prometheus_path)), exist_ok=True)
+            with open(tmp, 'w') as f:
+                f.write(self.prometheus())
+            os.replace(tmp, self.prometheus_path)
+        except OSError as e:
+            print(f"[TOVA] Could not export metrics: {e}")
+
+    def serve(self, port):
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, kind = tracer.prometheus().encode(), 'text/plain; version=0.0.4'
+                elif self.path == '/summary':
+                    body, kind = json.dumps(tracer.summary()).encode(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self.prometheus_path:
+            self.export()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        with self._file_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+# Module-level API. With config.TRACING off every call returns right away
+# (span() hands back a shared no-op context manager), so the hooks can stay
+# in hot paths.
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def enabled():
+    return config.TRACING
+
+
+def span(name):
+    if not config.TRACING:
+        return _NOOP
+    return get_tracer().span(name)
+
+
+def record(name, seconds):
+    if config.TRACING:
+        tracer = get_tracer()
+        tracer.record(name, seconds, tracer.current())
+
+
+def handoff(command, name, seconds):
+    if config.TRACING:
+        get_tracer().handoff(command, name, seconds)
+
+
+def current():
+    if not config.TRACING:
+        return None
+    return get_tracer().current()
+
+
+def begin(command):
+    if not config.TRACING:
+        return None
+    return get_tracer().begin(command)
+
+
+def attach(trace):
+    if trace is not None:
+        get_tracer().attach(trace)
+
+
+def detach():
+    if config.TRACING:
+        get_tracer().detach()
+
+
+def finish(trace):
+    if trace is not None:
+        return get_tracer().finish(trace)
+    return None
+
+
+def close():
+    if _tracer is not None:
+        _tracer.close()
@@ -1,45 +1,176 @@
-from core import config
-from core.engine import TovaEngine
-from voice.voice_listener import VoiceListener
+from core import config, tracing
+from core.engine import TovaEngine, FRIENDLY_PREFIXES, CLARIFICATION_RESPONSES, intent_detector
+from core.startup import Startup
+from voice.voice_listener import VoiceListener, get_model
 from voice.text_to_speech import get_tts
+from voice.speech_pipeline import SpeechPipeline
+import queue
+import signal
 import threading
 import sys
 
 
-def main():
-    engine = TovaEngine()
-    tts = get_tts()
-    listener = None
-    tts_lock = threading.Lock()
-    
-    def on_wake():
+class Assistant:
+    # Recognition (inside VoiceListener), command handling and speech each
+    # run on their own thread and talk through queues; the main thread just
+    # sleeps on the shutdown event until a signal arrives.
+    def __init__(self, engine, tts, startup=None):
+        self.engine = engine
+        self.tts = tts
+        self.startup = startup or Startup().start()
+        self.speech = SpeechPipeline(tts)
+        self.shutdown = threading.Event()
+        self.commands = queue.Queue(maxsize=config.COMMAND_QUEUE_SIZE)
+        self.replies = queue.Queue()
+        self.listener = None
+        self.server = None
+        self._cancel = None  # Set to stop the command being handled
+        self.workers = []
+
+    def on_wake(self):
         print("[TOVA] Wake word detected. Listening for command...")
+        if config.WAKE_ACK:
+            # Deaf while the ack plays, as while a reply plays: the mic would
+            # hear "Yes?", which confirms a pending action
+            self.listener.mute()
+            self.tts.say_async(config.WAKE_ACK, done=self.listener.unmute)
+
+    def interrupt(self, text=None):
+        # A new utterance supersedes the current reply: stop generating it
+        # (freeing the command worker) as well as speaking it
+        cancel = self._cancel
+        if cancel is not None:
+            cancel.set()
+        if self.tts.speaking:
+            self.speech.stop()  # Interrupt current speech
 
-    def on_command(cmd):
-        nonlocal listener
-        with tts_lock:
-            if tts.speaking:
-                tts.stop()  # Interrupt current speech
-            if listener:
-                listener.stop_listening()
+    def submit(self, cmd):
+        self.interrupt()
+        try:
+            self.commands.put_nowait(cmd)
+        except queue.Full:
+            print(f"[TOVA] Busy, dropped command: {cmd}")
+
+    def _command_worker(self):
+        while True:
+            cmd = self.commands.get()
+            if cmd is None:
+                break
             print(f"[TOVA] Command: {cmd}")
-            result = engine.handle_command(cmd)
-            print(f"[TOVA] Result: {result.get('message', str(result))}")
-            tts.speaking = True
-            tts.speak(result.get("message", str(result)))
-            tts.speaking = False
-            if listener:
-                listener.start_listening()
-
-    # Start voice listener in background
-    listener = VoiceListener(on_wake=on_wake, on_command=on_command)
-    listener.start_listening()
-    # Keep the main thread alive
-    try:
+            # Tokens go to the speech worker as they arrive, so speaking the
+            # first sentence overlaps generating the rest. The trace covers
+            # both and is finished by the speech worker.
+            trace = tracing.begin(cmd)
+            tokens = queue.Queue()
+            cancel = self._cancel = threading.Event()
+            self.replies.put((tokens, trace))
+            try:
+                for piece in self.engine.stream_command(cmd, cancel=cancel):
+                    if cancel.is_set():
+                        break
+                    tokens.put(piece)
+            except Exception as e:
+                print(f"[TOVA] Error handling command: {e}")
+                tokens.put("Sorry, something went wrong.")
+            finally:
+                tracing.detach()
+                tokens.put(None)
+
+    def _speech_worker(self):
         while True:
-            pass
-    except KeyboardInterrupt:
+            item = self.replies.get()
+            if item is None:
+                break
+            tokens, trace = item
+            tracing.attach(trace)
+            # With barge-in, speech heard meanwhile may interrupt the reply
+            # but is never taken as a command: it may be TTS itself
+            if self.listener and config.VOICE_BARGE_IN:
+                self.listener.hold()
+            elif self.listener:
+                self.listener.mute()
+            try:
+                reply = self.speech.speak_stream(iter(tokens.get, None))
+            finally:
+                if self.listener and config.VOICE_BARGE_IN:
+                    self.listener.release()
+                elif self.listener:
+                    self.listener.unmute()
+                tracing.finish(trace)
+            print(f"[TOVA] Result: {reply}")
+
+    def _handle_signal(self, signum, frame):
+        self.shutdown.set()
+
+    def start(self):
+        phrases = FRIENDLY_PREFIXES + CLARIFICATION_RESPONSES
+        if config.WAKE_ACK:
+            phrases = phrases + [config.WAKE_ACK]
+        # Replies render on demand until this finishes, so don't wait for it
+        self.startup.add('phrases', lambda: self.tts.prerender(phrases), required=False)
+        for target in (self._command_worker, self._speech_worker):
+            worker = threading.Thread(target=target, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        # Recognized commands go straight onto our queue; on_heard lets a new
+        # utterance cut off the current reply
+        self.listener = VoiceListener(
+            wake_word=config.WAKE_WORD, on_wake=self.on_wake, commands=self.commands,
+            on_heard=self.interrupt, early_trigger=self.engine.is_complete_command,
+        )
+        self.listener.start_listening()
+        if config.DAEMON_ENABLED:
+            # Other front-ends (hotkey, CLI, UI) share this engine and its models
+            from core.server import TovaServer
+            self.server = TovaServer(self.engine, startup=self.startup)
+            self.server.serve_in_thread()
+
+    def stop(self):
         print("[TOVA] Shutting down.")
+        if self.server:
+            self.server.stop()
+        if self.listener:
+            self.listener.stop_listening()
+        self.speech.stop()
+        self.commands.put(None)
+        self.replies.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.engine.close()
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        self.start()
+        self.shutdown.wait()
+        self.stop()
+
+
+def main():
+    # Everything slow loads at once. Listening starts as soon as the engine,
+    # TTS and speech model are up; the LLM and intent model keep warming in
+    # the background and are waited for only if a command needs them first.
+    startup = Startup()
+    startup.add('engine', TovaEngine)
+    startup.add('tts', get_tts)
+    startup.add('speech model', lambda: get_model("en-us"))
+    startup.add('intent model', intent_detector.warm_up, required=False)
+    if config.OLLAMA_PRELOAD:
+        startup.add('llm', lambda: startup.wait('engine').ollama.preload(), required=False, after=['engine'])
+    startup.start()
+    try:
+        ready = startup.wait_required()
+    except RuntimeError as e:
+        print(f"[TOVA] Could not start: {e}")
+        sys.exit(1)
+    print(f"[TOVA] Ready in {ready:.2f}s ({startup.report()})")
+
+    def report():
+        startup.wait_all()
+        print(f"[TOVA] Startup finished: {startup.report()}")
+
+    threading.Thread(target=report, daemon=True).start()
+    Assistant(startup.wait('engine'), startup.wait('tts'), startup).run()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,297 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import sqlite3
+import struct
+import threading
+import time
+from core import config
+
+# inotify(7) constants
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT = struct.Struct('iIII')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL);
+CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5(name, tokenize='trigram');
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class Inotify:
+    # Thin ctypes wrapper around the Linux inotify API
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def add_watch(self, path):
+        wd = self._add(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.watches[wd] = path
+        return wd
+
+    def read(self, timeout=1.0):
+        # Returns [(directory, name, mask)], or [] after timeout
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+            raw = buf[offset + _EVENT.size:offset + _EVENT.size + length]
+            offset += _EVENT.size + length
+            name = os.fsdecode(raw.rstrip(b'\0'))
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            events.append((self.watches.get(wd), name, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileIndex:
+    # Filenames under `roots` in SQLite, with an FTS5 trigram index on the
+    # basename so substring and glob queries never walk the disk. The index
+    # persists between runs; on start() it is refreshed in the background
+    # (old results stay queryable meanwhile) and then kept current from
+    # inotify events, falling back to a periodic rescan when inotify is
+    # unavailable, runs out of watches or overflows.
+    def __init__(self, roots=None, db_path=None, exclude=None, rescan_interval=None):
+        self.roots = [os.path.abspath(os.path.expanduser(r)) for r in (roots or config.FILE_INDEX_ROOTS)]
+        self.db_path = db_path or config.FILE_INDEX_PATH
+        self.exclude = set(config.FILE_INDEX_EXCLUDE if exclude is None else exclude)
+        self.rescan_interval = rescan_interval or config.FILE_INDEX_RESCAN
+        self.ready = threading.Event()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        db = self._db()
+        db.executescript(SCHEMA)
+        if self._meta('built_at'):
+            self.ready.set()
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _meta(self, key):
+        row = self._db().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def covers(self, directory):
+        directory = os.path.abspath(os.path.expanduser(directory))
+        return any(directory == r or directory.startswith(r.rstrip(os.sep) + os.sep) for r in self.roots)
+
+    # Writing
+
+    def _walk(self, top):
+        for root, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if d not in self.exclude]
+            yield root, dirs
+            for name in files:
+                yield os.path.join(root, name), None
+
+    def _insert(self, db, paths):
+        for path in paths:
+            cur = db.execute('INSERT OR IGNORE INTO entries (path) VALUES (?)', (path,))
+            if cur.rowcount:
+                db.execute('INSERT INTO names (rowid, name) VALUES (?, ?)', (cur.lastrowid, os.path.basename(path)))
+
+    def add(self, path):
+        with self._write_lock:
+            db = self._db()
+            with db:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    self._insert(db, [p for p, dirs in self._walk(path) if dirs is None])
+                else:
+                    self._insert(db, [path])
+
+    def remove(self, path):
+        # Removes path and, if it was a directory, everything below it
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._write_lock:
+            db = self._db()
+            with db:
+                ids = db.execute(
+                    'SELECT id FROM entries WHERE path = ? OR (path >= ? AND path < ?)',
+                    (path, prefix, prefix[:-1] + chr(ord(os.sep) + 1)),
+                ).fetchall()
+                db.executemany('DELETE FROM names WHERE rowid = ?', ids)
+                db.executemany('DELETE FROM entries WHERE id = ?', ids)
+
+    def build(self):
+        # Full rescan, swapped in as a single transaction
+        with self._write_lock:
+            db = self._db()
+            with db:
+                db.execute('DELETE FROM entries')
+                db.execute('DELETE FROM names')
+                for root in self.roots:
+                    batch = []
+                    for path, dirs in self._walk(root):
+                        if dirs is None:
+                            batch.append(path)
+                        if len(batch) >= 5000:
+                            self._insert(db, batch)
+                            batch = []
+                    self._insert(db, batch)
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built_at', ?)", (str(time.time()),))
+        self.ready.set()
+
+    # Watching
+
+    def _watch_tree(self, top):
+        for path, dirs in self._walk(top):
+            if dirs is not None:
+                self._inotify.add_watch(path)
+
+    def _run(self):
+        try:
+            self._inotify = Inotify()
+            for root in self.roots:
+                self._watch_tree(root)
+        except OSError as e:
+            # No inotify, or fs.inotify.max_user_watches exhausted
+            print(f"[TOVA] File index: inotify unavailable ({e}), rescanning every {self.rescan_interval}s")
+            if self._inotify:
+                self._inotify.close()
+            self._inotify = None
+        # Build after the watches are in place so nothing slips between them
+        self.build()
+        if self._inotify is None:
+            while not self._stop.wait(self.rescan_interval):
+                self.build()
+            return
+        while not self._stop.is_set():
+            for directory, name, mask in self._inotify.read():
+                if mask & IN_Q_OVERFLOW:
+                    self.build()
+                    continue
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    if mask & IN_ISDIR:
+                        try:
+                            self._watch_tree(path)
+                        except OSError:
+                            pass
+                    self.add(path)
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.remove(path)
+        self._inotify.close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    # Querying
+
+    def _query(self, pattern, mode, directory):
+        if mode == 'glob':
+            where, args = 'n.name GLOB ?', [pattern]
+        elif not any(c in pattern for c in '%_\\'):
+            where, args = 'n.name LIKE ?', [f'%{pattern}%']
+        else:
+            # SQLite won't use the trigram index for LIKE with an ESCAPE
+            # clause, so narrow down by the trigram phrase first
+            escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where, args = "n.name LIKE ? ESCAPE '\\'", [f'%{escaped}%']
+            if len(pattern) >= 3:
+                where = 'names MATCH ? AND ' + where
+                args.insert(0, '"' + pattern.replace('"', '""') + '"')
+        sql = f'SELECT e.path FROM names n JOIN entries e ON e.id = n.rowid WHERE {where}'
+        if directory:
+            prefix = os.path.abspath(os.path.expanduser(directory)).rstrip(os.sep) + os.sep
+            sql += ' AND e.path >= ? AND e.path < ?'
+            args += [prefix, prefix[:-1] + chr(ord(os.sep) + 1)]
+        return sql, args
+
+    def _fuzzy(self, pattern, directory, limit):
+        from rapidfuzz import fuzz, process
+        from rapidfuzz.utils import default_process
+        grams = {pattern.lower()[i:i + 3] for i in range(max(1, len(pattern) - 2))}
+        match = ' OR '.join('"' + g.replace('"', '""') + '"' for g in grams)
+        sql = 'SELECT e.path, n.name FROM names n JOIN entries e ON e.id = n.rowid WHERE names MATCH ?'
+        args = [match]
+        if directory:
+            prefix = os.path.abspath(os.path.expanduser(directory)).rstrip(os.sep) + os.sep
+            sql += ' AND e.path >= ? AND e.path < ?'
+            args += [prefix, prefix[:-1] + chr(ord(os.sep) + 1)]
+        sql += ' ORDER BY rank LIMIT ?'
+        args.append(config.FILE_INDEX_FUZZY_CANDIDATES)
+        rows = self._db().execute(sql, args).fetchall()
+        names = {path: name for path, name in rows}
+        best = process.extract(pattern, names, scorer=fuzz.WRatio, processor=default_process, limit=limit, score_cutoff=60)
+        return [path for _, _, path in best]
+
+    def search(self, pattern, mode='substring', directory=None, limit=None, offset=0):
+        if mode == 'fuzzy':
+            if len(pattern) < 3:
+                mode = 'substring'
+            else:
+                return self._fuzzy(pattern, directory, (limit or 50) + offset)[offset:]
+        sql, args = self._query(pattern, mode, directory)
+        sql += ' ORDER BY e.path LIMIT ? OFFSET ?'
+        args += [-1 if limit is None else limit, offset]
+        return [row[0] for row in self._db().execute(sql, args)]
+
+    def iter_search(self, pattern, mode='substring', directory=None, batch=500):
+        # Yields matches a page at a time without materializing them all
+        offset = 0
+        while True:
+            page = self.search(pattern, mode, directory, limit=batch, offset=offset)
+            yield from page
+            if len(page) < batch:
+                break
+            offset += batch
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    # Shared index, started on first use
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FileIndex().start()
+        return _index
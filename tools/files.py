@@ -1,18 +1,175 @@
+import fnmatch
+import itertools
+import mmap
 import os
+from core import config
 
-def search_files(directory, pattern) -> dict:
-    matches = []
+def _walk_matches(directory, pattern, mode='substring'):
+    # Fallback when the index doesn't cover `directory` or isn't built yet
+    lowered = pattern.lower()
+    if mode == 'fuzzy':
+        from rapidfuzz import fuzz
     for root, dirs, files in os.walk(directory):
         for name in files:
-            if pattern in name:
-                matches.append(os.path.join(root, name))
-    return {"status": "ok", "matches": matches}
+            if mode == 'glob':
+                hit = fnmatch.fnmatchcase(name, pattern)
+            elif mode == 'fuzzy':
+                hit = fuzz.partial_ratio(lowered, name.lower()) >= 80
+            else:
+                hit = lowered in name.lower()
+            if hit:
+                yield os.path.join(root, name)
 
-def read_file(path) -> dict:
+def _index_for(directory, indexed=True):
+    # indexed=False never opens the index, so nothing builds its database
+    # or starts watching the home directory
+    if not (config.FILE_INDEX_ENABLED and indexed):
+        return None
+    from tools.file_index import get_index
+    index = get_index()
+    if index.ready.is_set() and index.covers(directory):
+        return index
+    return None
+
+def iter_search_files(directory, pattern, mode='substring', indexed=True):
+    # Streams matches instead of collecting them into one list
+    index = _index_for(directory, indexed)
+    if index:
+        return index.iter_search(pattern, mode, directory)
+    return _walk_matches(directory, pattern, mode)
+
+def search_files(directory, pattern, mode='substring', limit=None, offset=0, indexed=True) -> dict:
+    # mode is 'substring', 'glob' or 'fuzzy'; limit/offset page through results
+    try:
+        index = _index_for(directory, indexed)
+        if index:
+            matches = index.search(pattern, mode, directory, limit=limit, offset=offset)
+        else:
+            stop = None if limit is None else offset + limit
+            matches = list(itertools.islice(_walk_matches(directory, pattern, mode), offset, stop))
+        return {"status": "ok", "matches": matches, "indexed": index is not None}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def _is_binary(sample: bytes):
+    if b'\0' in sample:
+        return True
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off at the end of the sample is fine
+        return e.start < len(sample) - 3
+    return False
+
+def _decode(data: bytes):
+    return data.decode('utf-8', errors='replace')
+
+# The readers below stop after `limit` + 1 bytes (when a limit is given),
+# so the caller can tell the text was cut without reading all of a huge line
+
+def _head_lines(f, n, limit=None):
+    lines, read = [], 0
+    while len(lines) < n and (limit is None or read <= limit):
+        line = f.readline(-1 if limit is None else limit + 1 - read)
+        if not line:
+            break
+        lines.append(line)
+        read += len(line)
+    return b''.join(lines)
+
+def _tail_lines(f, size, n, limit=None, block=64 * 1024):
+    # Reads backwards from the end until enough line breaks are found, so
+    # the cost depends on n, not on the file size
+    if n <= 0 or size == 0:
+        return b''
+    f.seek(size - 1)
+    trailing = f.read(1) == b'\n'
+    # The n lines plus the break just before them; a trailing newline ends
+    # the last line rather than starting a new one
+    wanted = n + 1 if trailing else n
+    floor = 0 if limit is None else max(0, size - limit - 1)
+    end = size
+    chunks, found = [], 0
+    while end > floor and found < wanted:
+        start = max(floor, end - block)
+        f.seek(start)
+        chunk = f.read(end - start)
+        found += chunk.count(b'\n')
+        chunks.append(chunk)
+        end = start
+    data = b''.join(reversed(chunks))
+    parts = data.split(b'\n')
+    if trailing:
+        parts = parts[:-1]
+    return b'\n'.join(parts[-n:]) + (b'\n' if trailing else b'')
+
+def _line_range(mm, first, last, limit=None):
+    # 1-based, inclusive; scans newlines with mmap.find instead of decoding
+    pos = 0
+    for _ in range(first - 1):
+        pos = mm.find(b'\n', pos) + 1
+        if pos == 0:
+            return b''
+    stop = len(mm) if limit is None else min(len(mm), pos + limit + 1)
+    end = pos
+    for _ in range(last - first + 1):
+        nxt = mm.find(b'\n', end, stop)
+        if nxt == -1:
+            return mm[pos:stop]
+        end = nxt + 1
+    return mm[pos:end]
+
+def read_file(path, head=None, tail=None, lines=None, byte_range=None, max_bytes=None) -> dict:
+    # head/tail: number of lines; lines: (first, last), 1-based inclusive;
+    # byte_range: (start, end). Files larger than max_bytes without any of
+    # these come back summarized as their first and last lines; with them,
+    # at most max_bytes come back (the last ones for tail).
+    max_bytes = config.READ_FILE_MAX_BYTES if max_bytes is None else max_bytes
     try:
-        with open(path, 'r') as f:
-            content = f.read()
-        return {"status": "ok", "content": content}
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            if _is_binary(f.read(8192)):
+                f.seek(0)
+                preview = f.read(64).hex(' ')
+                return {"status": "ok", "binary": True, "size": size,
+                        "content": f"Binary file, {size} bytes. Starts with: {preview}"}
+            f.seek(0)
+            if byte_range is not None:
+                start, end = byte_range
+                f.seek(start)
+                data = f.read(max(0, min(end, size, start + max_bytes + 1) - start))
+            elif tail is not None:
+                data = _tail_lines(f, size, tail, max_bytes)
+            elif head is not None:
+                data = _head_lines(f, head, max_bytes)
+            elif lines is not None:
+                if size == 0:
+                    data = b''
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        data = _line_range(mm, *lines, max_bytes)
+            elif size > max_bytes:
+                n = config.READ_FILE_SUMMARY_LINES
+                half = max_bytes // 2
+                first = _decode(_head_lines(f, n, half)[:half])
+                f.seek(0)
+                last = _decode(_tail_lines(f, size, n, half)[-half:])
+                return {"status": "ok", "truncated": True, "size": size,
+                        "content": f"{first}\n... [{size} bytes, showing first and last {n} lines] ...\n{last}"}
+            else:
+                data = f.read()
+        if len(data) > max_bytes:
+            # Cut at a line break where there is one, not mid-line
+            if tail is not None:
+                data = data[-max_bytes:]
+                cut = data.find(b'\n') + 1
+                content = f"... [showing the last {max_bytes} bytes] ...\n" + _decode(data[cut:] if 0 < cut < len(data) else data)
+            else:
+                data = data[:max_bytes]
+                cut = data.rfind(b'\n') + 1
+                content = _decode(data[:cut] if cut else data) + f"\n... [truncated at {max_bytes} bytes] ..."
+            return {"status": "ok", "truncated": True, "size": size, "content": content}
+        return {"status": "ok", "content": _decode(data), "size": size}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
@@ -29,4 +186,4 @@ def create_file(path, content="") -> dict:
             f.write(content)
         return {"status": "ok", "message": f"Created {path}"}
     except Exception as e:
-        return {"status": "error", "message": str(e)} 
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
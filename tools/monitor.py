@@ -1,22 +1,169 @@
+import datetime
+import threading
+import time
+from collections import deque
 import psutil
+from core import config
 
-def cpu_usage() -> dict:
+METRICS = ('cpu', 'ram', 'disk', 'net_sent', 'net_recv')
+
+
+class MetricsSampler:
+    # Samples CPU (per core), RAM, disk and network every `interval` seconds
+    # on a background thread. The last `history` seconds are kept in a ring
+    # buffer; for the current day only running peak/sum/count per metric are
+    # kept, so memory stays bounded however long it runs.
+    def __init__(self, interval=None, history=None):
+        self.interval = interval or config.METRICS_INTERVAL
+        history = history or config.METRICS_HISTORY
+        self.samples = deque(maxlen=max(1, int(history / self.interval)))
+        self.day = None
+        self.daily = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_net = None
+
+    def start(self):
+        if self._thread is None:
+            psutil.cpu_percent(percpu=True)  # Prime the CPU counters
+            self._last_net = (time.monotonic(), psutil.net_io_counters())
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"[TOVA] Metrics sampler error: {e}")
+
+    def sample(self):
+        # Non-blocking: cpu_percent(interval=None) reports usage since the
+        # previous call, i.e. over the last sampling interval
+        per_core = psutil.cpu_percent(percpu=True)
+        now_mono = time.monotonic()
+        net = psutil.net_io_counters()
+        then, last = self._last_net
+        elapsed = max(now_mono - then, 1e-6)
+        self._last_net = (now_mono, net)
+        sample = {
+            'time': time.time(),
+            'cpu': round(sum(per_core) / len(per_core), 1) if per_core else 0.0,
+            'per_core': per_core,
+            'ram': psutil.virtual_memory().percent,
+            'disk': psutil.disk_usage('/').percent,
+            'net_sent': (net.bytes_sent - last.bytes_sent) / elapsed,
+            'net_recv': (net.bytes_recv - last.bytes_recv) / elapsed,
+        }
+        today = datetime.date.today()
+        with self._lock:
+            self.samples.append(sample)
+            if today != self.day:
+                self.day = today
+                self.daily = {m: {'peak': 0.0, 'sum': 0.0, 'count': 0} for m in METRICS}
+            for m in METRICS:
+                agg = self.daily[m]
+                agg['peak'] = max(agg['peak'], sample[m])
+                agg['sum'] += sample[m]
+                agg['count'] += 1
+        return sample
+
+    def latest(self):
+        with self._lock:
+            return self.samples[-1] if self.samples else None
+
+    def window(self, metric, seconds):
+        # Average and peak of `metric` over the last `seconds`
+        cutoff = time.time() - seconds
+        with self._lock:
+            values = [s[metric] for s in reversed(self.samples) if s['time'] >= cutoff]
+        if not values:
+            return None
+        return {'average': round(sum(values) / len(values), 1), 'peak': round(max(values), 1), 'samples': len(values)}
+
+    def today(self, metric):
+        with self._lock:
+            agg = self.daily.get(metric)
+            if not agg or not agg['count']:
+                return None
+            return {'average': round(agg['sum'] / agg['count'], 1), 'peak': round(agg['peak'], 1), 'samples': agg['count']}
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = MetricsSampler().start()
+        return _sampler
+
+
+def _latest():
+    sample = get_sampler().latest()
+    if sample and time.time() - sample['time'] <= get_sampler().interval * 3:
+        return sample
+    return None
+
+
+def cpu_usage(per_core=False) -> dict:
     try:
-        usage = psutil.cpu_percent(interval=1)
-        return {"status": "ok", "cpu": usage}
+        sample = _latest()
+        if sample:
+            usage, cores = sample['cpu'], sample['per_core']
+        else:
+            # Sampler just started; take one short measurement
+            cores = psutil.cpu_percent(interval=0.2, percpu=True)
+            usage = round(sum(cores) / len(cores), 1)
+        result = {"status": "ok", "cpu": usage}
+        if per_core:
+            result["per_core"] = cores
+        return result
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 def ram_usage() -> dict:
     try:
-        mem = psutil.virtual_memory()
-        return {"status": "ok", "ram": mem.percent}
+        sample = _latest()
+        ram = sample['ram'] if sample else psutil.virtual_memory().percent
+        return {"status": "ok", "ram": ram}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 def disk_usage() -> dict:
     try:
-        disk = psutil.disk_usage('/')
-        return {"status": "ok", "disk": disk.percent}
+        sample = _latest()
+        disk = sample['disk'] if sample else psutil.disk_usage('/').percent
+        return {"status": "ok", "disk": disk}
     except Exception as e:
-        return {"status": "error", "message": str(e)} 
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
+
+def network_usage() -> dict:
+    try:
+        sample = _latest()
+        if not sample:
+            return {"status": "error", "message": "No network samples yet."}
+        return {"status": "ok", "sent_bps": round(sample['net_sent']), "recv_bps": round(sample['net_recv'])}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def metric_summary(metric, seconds=None) -> dict:
+    # Average and peak of cpu/ram/disk/net_sent/net_recv over the last
+    # `seconds`, or over today when seconds is None
+    try:
+        if metric not in METRICS:
+            return {"status": "error", "message": f"Unknown metric {metric}"}
+        sampler = get_sampler()
+        summary = sampler.window(metric, seconds) if seconds else sampler.today(metric)
+        if summary is None:
+            return {"status": "error", "message": f"No {metric} samples yet."}
+        return {"status": "ok", "metric": metric, **summary}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
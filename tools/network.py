@@ -1,6 +1,10 @@
+import asyncio
+import ipaddress
 import subprocess
-import socket
 import requests
+from core import config
+
+DEFAULT_SCAN_PORTS = [22, 80, 443]
 
 def ping(host) -> dict:
     try:
@@ -9,18 +13,144 @@ def ping(host) -> dict:
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-def port_scan(host, ports=[22, 80, 443]) -> dict:
-    open_ports = []
-    for port in ports:
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.settimeout(0.5)
-        try:
-            s.connect((host, port))
-            open_ports.append(port)
-        except:
-            pass
-        s.close()
-    return {"status": "ok", "open_ports": open_ports}
+def parse_ports(spec):
+    # "22,80,8000-8100" (or a list of ints/such strings) -> sorted unique ports
+    if isinstance(spec, int):
+        return [spec]
+    if isinstance(spec, str):
+        spec = spec.split(',')
+    # Each part is checked before its range is built, so "1-300000000"
+    # fails at once instead of filling a set
+    ports = set()
+    for part in spec:
+        if isinstance(part, int):
+            lo = hi = part
+        else:
+            part = part.strip()
+            if not part:
+                continue
+            lo, _, hi = part.partition('-')
+            lo, hi = int(lo), int(hi or lo)
+        if not 1 <= lo <= hi <= 65535:
+            raise ValueError("ports must be between 1 and 65535")
+        ports.update(range(lo, hi + 1))
+    return sorted(ports)
+
+def _host_parts(spec):
+    if isinstance(spec, str):
+        spec = spec.split(',')
+    for part in spec:
+        part = part.strip()
+        if not part:
+            continue
+        if '/' in part:
+            net = ipaddress.ip_network(part, strict=False)
+            yield net, net.num_addresses - 2 if net.num_addresses > 2 else net.num_addresses
+        else:
+            yield part, 1
+
+def iter_hosts(spec, limit=None):
+    # "host", "a,b", a CIDR like "192.168.1.0/30", or a list of those, as a
+    # generator of hosts. More than `limit` hosts (default
+    # PORT_SCAN_MAX_HOSTS) is refused up front with a ValueError.
+    parts = list(_host_parts(spec))
+    limit = config.PORT_SCAN_MAX_HOSTS if limit is None else limit
+    total = sum(n for _, n in parts)
+    if limit and total > limit:
+        raise ValueError(f"That range has {total} hosts; I can scan at most {limit} at once.")
+    return _expand_hosts(parts)
+
+def _expand_hosts(parts):
+    for part, _ in parts:
+        if isinstance(part, str):
+            yield part
+        else:
+            yield from (str(h) for h in (part.hosts() if part.num_addresses > 2 else part))
+
+def parse_hosts(spec, limit=None):
+    return list(iter_hosts(spec, limit))
+
+class _HostRateLimiter:
+    # Spaces connection attempts to each host at most `rate` per second
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_slot.get(host, now))
+        self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+async def _probe(host, port, timeout):
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+async def iter_port_scan(hosts, ports=None, concurrency=None, rate=None, timeout=0.5):
+    # Async generator yielding (host, port) for each open port as soon as it
+    # is found. At most `concurrency` connects are in flight and each host
+    # sees at most `rate` attempts per second.
+    ports = parse_ports(ports if ports is not None else DEFAULT_SCAN_PORTS)
+    iter_hosts(hosts)  # Refuses an oversized range before any probing
+    concurrency = concurrency or config.PORT_SCAN_CONCURRENCY
+    rate = config.PORT_SCAN_RATE if rate is None else rate
+    limiter = _HostRateLimiter(rate)
+    # Workers pull (host, port) pairs from a generator instead of a
+    # prebuilt queue, so a large range costs no memory up front
+    targets = ((host, port) for port in ports for host in iter_hosts(hosts))
+    found = asyncio.Queue()
+
+    async def worker():
+        for host, port in targets:
+            await limiter.wait(host)
+            if await _probe(host, port, timeout):
+                await found.put((host, port))
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    done = asyncio.gather(*workers)
+    try:
+        while not (done.done() and found.empty()):
+            getter = asyncio.ensure_future(found.get())
+            await asyncio.wait([getter, done], return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+    finally:
+        for w in workers:
+            w.cancel()
+
+async def scan_ports(hosts, ports=None, concurrency=None, rate=None, timeout=0.5, on_open=None):
+    results = {h: [] for h in iter_hosts(hosts)}
+    async for host, port in iter_port_scan(hosts, ports, concurrency, rate, timeout):
+        results[host].append(port)
+        if on_open:
+            on_open(host, port)
+    return {h: sorted(p) for h, p in results.items()}
+
+def port_scan(host, ports=None, concurrency=None, rate=None, timeout=0.5, on_open=None) -> dict:
+    # host: one host, several ("a,b" or a list) or a CIDR range.
+    # ports: list or "22,80,8000-8100"; defaults to 22, 80 and 443.
+    # on_open(host, port) is called as each open port is found.
+    try:
+        results = asyncio.run(scan_ports(host, ports, concurrency, rate, timeout, on_open))
+        if len(results) == 1:
+            return {"status": "ok", "open_ports": next(iter(results.values()))}
+        return {"status": "ok", "hosts": results}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
 
 def public_ip() -> dict:
     try:
@@ -1,12 +1,155 @@
+import re
+import threading
+import time
 import psutil
+from core import config
+
+
+class ProcessTable:
+    # Keeps psutil.Process objects alive between refreshes, so cpu_percent()
+    # measures usage since the previous refresh instead of returning 0.0.
+    # Static fields (name, user, start time) are read once per process, and
+    # refreshes closer together than min_interval reuse the last snapshot.
+    def __init__(self, min_interval=None):
+        self.min_interval = config.PROCESS_REFRESH_INTERVAL if min_interval is None else min_interval
+        self.procs = {}
+        self.static = {}
+        self.snapshot = {}
+        self.refreshed_at = 0.0
+        self._checkpoint = None
+        self._lock = threading.Lock()
+
+    def _track(self, pid):
+        try:
+            p = psutil.Process(pid)
+            with p.oneshot():
+                self.static[pid] = {
+                    'pid': pid,
+                    'name': p.name(),
+                    'username': p.username(),
+                    'started': p.create_time(),
+                }
+                p.cpu_percent(None)  # First call only primes the counter
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return
+        self.procs[pid] = p
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self.refreshed_at < self.min_interval:
+                return self.snapshot
+            pids = set(psutil.pids())
+            for pid in set(self.procs) - pids:
+                self.procs.pop(pid, None)
+                self.static.pop(pid, None)
+            for pid in pids - set(self.procs):
+                self._track(pid)
+            snapshot = {}
+            for pid, p in list(self.procs.items()):
+                try:
+                    with p.oneshot():
+                        cpu = p.cpu_percent(None)
+                        rss = p.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                    self.procs.pop(pid, None)
+                    self.static.pop(pid, None)
+                    continue
+                except psutil.AccessDenied:
+                    cpu, rss = None, None
+                snapshot[pid] = dict(self.static[pid], cpu_percent=cpu, memory_rss=rss)
+            self.snapshot = snapshot
+            self.refreshed_at = time.monotonic()
+            if self._checkpoint is None:
+                self._checkpoint = dict(snapshot)
+            return snapshot
+
+    def _sampled(self):
+        # cpu_percent needs two readings; on the very first refresh take a
+        # second one shortly after instead of reporting 0.0 everywhere
+        first = not self.refreshed_at
+        snapshot = self.refresh()
+        if first:
+            time.sleep(0.2)
+            snapshot = self.refresh(force=True)
+        return snapshot
+
+    def top(self, n=5, by='cpu'):
+        key = 'memory_rss' if by in ('memory', 'ram', 'mem') else 'cpu_percent'
+        procs = [p for p in self._sampled().values() if p[key] is not None]
+        procs.sort(key=lambda p: p[key], reverse=True)
+        return procs[:n]
+
+    def find(self, pattern, regex=False):
+        if regex:
+            rx = re.compile(pattern, re.I)
+            return [p for p in self.refresh().values() if rx.search(p['name'])]
+        pattern = pattern.lower()
+        return [p for p in self.refresh().values() if pattern in p['name'].lower()]
+
+    def changes(self):
+        # Processes started and exited since the previous call
+        snapshot = self.refresh(force=True)
+        with self._lock:
+            before = self._checkpoint or {}
+            started = [p for pid, p in snapshot.items() if pid not in before]
+            exited = [p for pid, p in before.items() if pid not in snapshot]
+            self._checkpoint = dict(snapshot)
+        return started, exited
+
+    def info(self, pid):
+        snapshot = self._sampled()
+        if pid not in snapshot:
+            # Started since the last refresh; sample it over a short window
+            with self._lock:
+                self._track(pid)
+            time.sleep(0.2)
+            snapshot = self.refresh(force=True)
+        if pid not in snapshot:
+            raise psutil.NoSuchProcess(pid)
+        return snapshot[pid]
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_table():
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = ProcessTable()
+        return _table
+
 
 def list_processes() -> dict:
     try:
-        procs = [p.info for p in psutil.process_iter(['pid', 'name', 'username'])]
+        procs = [
+            {'pid': p['pid'], 'name': p['name'], 'username': p['username']}
+            for p in get_table().refresh().values()
+        ]
         return {"status": "ok", "processes": procs}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+def top_processes(n=5, by='cpu') -> dict:
+    try:
+        return {"status": "ok", "processes": get_table().top(n, by)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def find_processes(pattern, regex=False) -> dict:
+    try:
+        return {"status": "ok", "processes": get_table().find(pattern, regex)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def process_changes() -> dict:
+    try:
+        started, exited = get_table().changes()
+        return {"status": "ok", "started": started, "exited": exited}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 def kill_process(pid: int) -> dict:
     try:
         p = psutil.Process(pid)
@@ -17,8 +160,6 @@ def kill_process(pid: int) -> dict:
 
 def monitor_process(pid: int) -> dict:
     try:
-        p = psutil.Process(pid)
-        info = p.as_dict(attrs=['pid', 'name', 'cpu_percent', 'memory_info'])
-        return {"status": "ok", "info": info}
+        return {"status": "ok", "info": get_table().info(pid)}
     except Exception as e:
-        return {"status": "error", "message": str(e)} 
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
@@ -1,12 +1,218 @@
+import itertools
+import os
+import signal
 import subprocess
+import threading
+import time
+from collections import deque
+from core import config
 
-def run_terminal_command(command: str) -> dict:
+
+class Job:
+    # One shell command running in its own process group. stdout and stderr
+    # are read line by line on background threads into a bounded buffer, so
+    # a chatty scan can't grow memory without limit; on_output sees every
+    # line as it arrives. Lines are cut at max_line_chars, so neither can one
+    # endless line.
+    def __init__(self, job_id, command, timeout=None, on_output=None, max_lines=None, max_line_chars=None):
+        self.id = job_id
+        self.command = command
+        self.timeout = timeout
+        self.on_output = on_output
+        self.lines = deque(maxlen=max_lines or config.TERMINAL_OUTPUT_LINES)
+        self.max_line_chars = max_line_chars or config.TERMINAL_LINE_CHARS
+        self.line_count = 0
+        self.status = 'running'
+        self.returncode = None
+        self.started = time.time()
+        self.ended = None
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._timer = None
+        self.process = subprocess.Popen(
+            command, shell=True, text=True, bufsize=1, errors='replace',
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            start_new_session=True,
+        )
+        self._readers = [
+            threading.Thread(target=self._read, args=(self.process.stdout, 'out'), daemon=True),
+            threading.Thread(target=self._read, args=(self.process.stderr, 'err'), daemon=True),
+        ]
+        for reader in self._readers:
+            reader.start()
+        threading.Thread(target=self._wait, daemon=True).start()
+        if timeout:
+            self._timer = threading.Timer(timeout, self.kill, args=('timeout',))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _read(self, pipe, stream):
+        cut = False  # Inside a line already cut; the rest of it is skipped
+        while True:
+            piece = pipe.readline(self.max_line_chars)
+            if not piece:
+                break
+            ended = piece.endswith('\n')
+            if cut:
+                cut = not ended
+                continue
+            line = piece.rstrip('\n')
+            if not ended and len(piece) >= self.max_line_chars:
+                line += ' ...[line cut]'
+                cut = True
+            with self._lock:
+                self.lines.append((stream, line))
+                self.line_count += 1
+            if self.on_output:
+                try:
+                    self.on_output(self, stream, line)
+                except Exception as e:
+                    print(f"[TOVA] Job {self.id} output handler error: {e}")
+        pipe.close()
+
+    def _wait(self):
+        returncode = self.process.wait()
+        for reader in self._readers:
+            reader.join()
+        if self._timer:
+            self._timer.cancel()
+        with self._lock:
+            self.returncode = returncode
+            self.ended = time.time()
+            if self.status == 'running':
+                self.status = 'done' if returncode == 0 else 'failed'
+        self.done.set()
+
+    def kill(self, reason='cancelled', grace=None):
+        # SIGTERM to the whole process group, SIGKILL if it lingers
+        with self._lock:
+            if self.status != 'running':
+                return False
+            self.status = reason
+        grace = config.TERMINAL_KILL_GRACE if grace is None else grace
+        try:
+            os.killpg(self.process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return True
+        threading.Thread(target=self._reap, args=(grace,), daemon=True).start()
+        return True
+
+    def _reap(self, grace):
+        try:
+            self.process.wait(grace)
+        except subprocess.TimeoutExpired:
+            pass
+        try:
+            # The shell may be gone while its children hold the group
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def output(self, stream='out', tail=None):
+        with self._lock:
+            lines = [line for s, line in self.lines if s == stream]
+        if tail:
+            lines = lines[-tail:]
+        return '\n'.join(lines)
+
+    def to_dict(self, tail=None):
+        with self._lock:
+            status, returncode, ended, dropped = self.status, self.returncode, self.ended, self.line_count - len(self.lines)
+        return {
+            "id": self.id,
+            "command": self.command,
+            "state": status,
+            "returncode": returncode,
+            "runtime": round((ended or time.time()) - self.started, 1),
+            "output": self.output('out', tail),
+            "error": self.output('err', tail),
+            "dropped_lines": dropped,
+        }
+
+
+class JobManager:
+    # Running and recently finished jobs, addressable by a small integer id
+    def __init__(self, keep_finished=None):
+        self.keep_finished = keep_finished or config.TERMINAL_KEEP_FINISHED
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, command, timeout=None, on_output=None):
+        with self._lock:
+            job = Job(next(self._ids), command, timeout, on_output)
+            self.jobs[job.id] = job
+            finished = [j for j in self.jobs.values() if j.done.is_set()]
+            for old in finished[:max(0, len(finished) - self.keep_finished)]:
+                del self.jobs[old.id]
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self, running_only=False):
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return [j for j in jobs if not running_only or not j.done.is_set()]
+
+    def kill(self, job_id):
+        job = self.get(job_id)
+        return job.kill() if job else False
+
+    def kill_all(self):
+        for job in self.list(running_only=True):
+            job.kill()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
+
+
+def run_terminal_command(command: str, timeout=None) -> dict:
+    # Blocking; the command is killed (with its children) after `timeout`
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=30)
+        job = get_manager().start(command, timeout=timeout or config.TERMINAL_TIMEOUT)
+        job.wait()
         return {
-            "status": "ok" if result.returncode == 0 else "error",
-            "output": result.stdout.strip(),
-            "error": result.stderr.strip()
+            "status": "ok" if job.status == 'done' else "error",
+            "output": job.output('out').strip(),
+            "error": job.output('err').strip() or ("Timed out." if job.status == 'timeout' else ""),
         }
     except Exception as e:
-        return {"status": "error", "output": "", "error": str(e)} 
\ No newline at end of file
+        return {"status": "error", "output": "", "error": str(e)}
+
+def start_job(command: str, timeout=None, on_output=None) -> dict:
+    try:
+        job = get_manager().start(command, timeout=timeout, on_output=on_output)
+        return {"status": "ok", "job": job.id}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def job_status(job_id: int, tail=None) -> dict:
+    job = get_manager().get(job_id)
+    if job is None:
+        return {"status": "error", "message": f"No job {job_id}."}
+    return {"status": "ok", "job": job.to_dict(tail)}
+
+def list_jobs(running_only=False) -> dict:
+    return {"status": "ok", "jobs": [j.to_dict(tail=1) for j in get_manager().list(running_only)]}
+
+def kill_job(job_id: int) -> dict:
+    job = get_manager().get(job_id)
+    if job is None:
+        return {"status": "error", "message": f"No job {job_id}."}
+    if not job.kill():
+        return {"status": "error", "message": f"Job {job_id} already {job.status}."}
+    return {"status": "ok", "message": f"Job {job_id} cancelled."}
@@ -0,0 +1,41 @@
+import threading
+from collections import OrderedDict
+
+
+class AudioCache:
+    # Rendered speech keyed by (voice, rate, text), evicting the least
+    # recently used clips once the total size passes max_bytes
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._clips = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._clips
+
+    def get(self, key):
+        with self._lock:
+            audio = self._clips.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._clips.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key, audio):
+        if not audio or len(audio) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._clips.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._clips[key] = audio
+            self.size += len(audio)
+            while self.size > self.max_bytes:
+                _, evicted = self._clips.popitem(last=False)
+                self.size -= len(evicted)
@@ -0,0 +1,81 @@
+import queue
+import re
+import threading
+from core import tracing
+
+SENTENCE_END = re.compile(r'[.!?:;]+["\')\]]*\s+|\n+')
+MIN_SENTENCE_CHARS = 6
+
+
+def split_sentences(tokens, min_chars=MIN_SENTENCE_CHARS):
+    # Regroups a token stream into sentences as soon as each one ends.
+    # Very short pieces ("e.g. ") are held back and merged with what
+    # follows so the TTS isn't fed fragments. Friendly prefixes ("Sure! ")
+    # come out on their own, which lets them play from the phrase cache.
+    buf = ''
+    for token in tokens:
+        buf += token
+        start = 0
+        for m in SENTENCE_END.finditer(buf):
+            if m.end() - start >= min_chars:
+                sentence = buf[start:m.end()].strip()
+                if sentence:
+                    yield sentence
+                start = m.end()
+        buf = buf[start:]
+    if buf.strip():
+        yield buf.strip()
+
+
+class SpeechPipeline:
+    # Speaks a token stream sentence by sentence. A worker thread synthesizes
+    # upcoming sentences while the caller's thread plays the current one, so
+    # audio starts after the first sentence rather than the whole reply.
+    _DONE = object()
+
+    def __init__(self, tts, lookahead=2):
+        self.tts = tts
+        self.lookahead = lookahead
+        self._cancelled = threading.Event()
+
+    def stop(self):
+        self._cancelled.set()
+        self.tts.stop()
+
+    def _synthesize(self, tokens, out, spoken, cancelled, trace=None):
+        tracing.attach(trace)
+        try:
+            for sentence in split_sentences(tokens):
+                if cancelled.is_set():
+                    break
+                spoken.append(sentence)
+                out.put((sentence, self.tts.synthesize(sentence)))
+        finally:
+            out.put(self._DONE)
+
+    def speak_stream(self, tokens) -> str:
+        # Returns the full text that was produced
+        out = queue.Queue(maxsize=self.lookahead)
+        spoken = []
+        cancelled = self._cancelled = threading.Event()
+        worker = threading.Thread(target=self._synthesize, args=(tokens, out, spoken, cancelled, tracing.current()), daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = out.get()
+                if item is self._DONE or cancelled.is_set():
+                    break
+                sentence, audio = item
+                if audio:
+                    self.tts.play(audio)
+                else:
+                    self.tts.speak(sentence)
+        finally:
+            cancelled.set()
+            # Drain so a worker blocked on a full queue can finish
+            while worker.is_alive():
+                try:
+                    out.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        return ' '.join(spoken)
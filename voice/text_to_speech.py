@@ -1,5 +1,12 @@
+import io
+import os
+import queue
+import tempfile
+import threading
+import wave
 import pyttsx3
-from core import config
+from core import config, tracing
+from voice.audio_cache import AudioCache
 
 try:
     from rhvoice_wrapper import RHVoice
@@ -11,6 +18,11 @@ class TextToSpeech:
     def __init__(self):
         self.use_rhvoice = rhvoice_available
         self.speaking = False
+        self._engine_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.cache = AudioCache(config.TTS_CACHE_BYTES)
+        self._queue = queue.Queue()
+        self._player = None
         if self.use_rhvoice:
             self.tts = RHVoice()
             # Use a female English voice if available
@@ -27,21 +39,119 @@ class TextToSpeech:
                     break
         # For more natural speech, consider using Coqui TTS (https://github.com/coqui-ai/TTS)
 
+    def _voice_key(self, text):
+        voice = self.voice if self.use_rhvoice else self.engine.getProperty('voice')
+        return (voice, config.VOICE['rate'], text.strip())
+
     def speak(self, text):
+        # Blocking. Goes through the cache and chunked playback whenever the
+        # backend can render offline, so stop() interrupts on both backends.
+        with tracing.span('tts.speak'):
+            audio = self.synthesize(text)
+            if audio:
+                self.play(audio)
+                return
+            self.speaking = True
+            with self._engine_lock:
+                if self.use_rhvoice:
+                    self.tts.say(text, voice=self.voice)
+                else:
+                    self.engine.say(text)
+                    self.engine.runAndWait()
+            self.speaking = False
+
+    def synthesize(self, text):
+        # Render text to WAV bytes without playing it, so the next sentence
+        # can be synthesized while the current one plays. Returns None when
+        # the backend can't render offline; callers then fall back to speak().
+        key = self._voice_key(text)
+        audio = self.cache.get(key)
+        if audio is None:
+            with tracing.span('tts.synthesize'):
+                audio = self._render(text)
+            self.cache.put(key, audio)
+        return audio
+
+    def _render(self, text):
+        with self._engine_lock:
+            if self.use_rhvoice:
+                if not hasattr(self.tts, 'get'):
+                    return None
+                return self.tts.get(text, voice=self.voice, format_='wav')
+            fd, path = tempfile.mkstemp(suffix='.wav')
+            os.close(fd)
+            try:
+                self.engine.save_to_file(text, path)
+                self.engine.runAndWait()
+                with open(path, 'rb') as f:
+                    return f.read() or None
+            finally:
+                os.remove(path)
+
+    def prerender(self, phrases):
+        # Fill the cache with fixed phrases on a background thread so they
+        # play instantly later
+        def render_all():
+            for phrase in phrases:
+                key = self._voice_key(phrase)
+                if key not in self.cache:
+                    self.cache.put(key, self._render(phrase))
+        thread = threading.Thread(target=render_all, daemon=True)
+        thread.start()
+        return thread
+
+    def say_async(self, text, done=None):
+        # Queue text for the playback thread and return immediately. done()
+        # is called once it has been spoken, cut off or dropped by stop().
+        if self._player is None:
+            self._player = threading.Thread(target=self._play_loop, daemon=True)
+            self._player.start()
+        self._queue.put((text, done))
+
+    def _play_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            text, done = item
+            try:
+                self.speak(text)
+            finally:
+                if done:
+                    done()
+
+    def play(self, audio, chunk_ms=100):
+        # Plays WAV bytes from synthesize() in small chunks so stop() can cut in
+        import sounddevice as sd
+        with wave.open(io.BytesIO(audio), 'rb') as wav:
+            rate = wav.getframerate()
+            channels = wav.getnchannels()
+            width = wav.getsampwidth()
+            frames = wav.readframes(wav.getnframes())
+        dtype = {1: 'uint8', 2: 'int16', 4: 'int32'}[width]
+        step = max(1, rate * chunk_ms // 1000) * channels * width
+        self._stop_event.clear()
         self.speaking = True
-        if self.use_rhvoice:
-            self.tts.say(text, voice=self.voice)
-        else:
-            self.engine.say(text)
-            self.engine.runAndWait()
-        self.speaking = False
+        try:
+            with tracing.span('tts.play'), sd.RawOutputStream(samplerate=rate, channels=channels, dtype=dtype) as out:
+                for i in range(0, len(frames), step):
+                    if self._stop_event.is_set():
+                        break
+                    out.write(frames[i:i + step])
+        finally:
+            self.speaking = False
 
     def stop(self):
-        if self.use_rhvoice:
-            # RHVoice python wrapper does not have a stop method, so this is a placeholder
-            # If you use a different TTS engine, implement interruption here
-            pass
-        else:
+        # Drop queued phrases and cut off whatever is playing
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item and item[1]:
+                item[1]()
+        self._stop_event.set()
+        if not self.use_rhvoice:
             self.engine.stop()
         self.speaking = False
 
@@ -3,48 +3,246 @@ import sounddevice as sd
 import vosk
 import json
 import threading
+import time
+from core import config, tracing
+
+# Vosk models are large and slow to load; every listener shares one per language
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(lang="en-us"):
+    with _models_lock:
+        if lang not in _models:
+            _models[lang] = vosk.Model(lang=lang)
+        return _models[lang]
+
 
 class VoiceListener:
-    def __init__(self, wake_word=None, on_wake=None, on_command=None, set_avatar_state=None):
+    # The input stream is opened once and stays open. Its callback only
+    # queues raw blocks; a recognizer thread turns them into text and puts
+    # recognized commands on a bounded queue. Commands are run either by the
+    # listener's own consumer thread (on_command) or, when a `commands` queue
+    # is passed in, by whoever reads that queue. mute() drops input, e.g.
+    # while TTS is playing, without closing the audio device. hold() keeps
+    # recognizing, but what is heard only calls on_heard (to interrupt TTS)
+    # and is dropped instead of queued; release() discards the utterance
+    # still in progress, which may be TTS heard through the mic.
+    #
+    # With a wake word, a recognizer restricted to just that word runs until
+    # it is heard, then a full-vocabulary one takes the next utterance. The
+    # wake word must be in the Vosk model's vocabulary. In low-latency mode
+    # blocks are smaller, and a partial result that early_trigger accepts is
+    # emitted as soon as it stops changing, without waiting for the silence
+    # that ends the utterance; the rest of that utterance is then discarded.
+    def __init__(self, wake_word=None, on_wake=None, on_command=None, set_avatar_state=None, commands=None, on_heard=None, low_latency=None, early_trigger=None):
         self.wake_word = wake_word.lower() if wake_word else None
         self.on_wake = on_wake
         self.on_command = on_command
+        self.on_heard = on_heard
         self.set_avatar_state = set_avatar_state
-        self.model = vosk.Model(lang="en-us")
+        self.low_latency = config.VOICE_LOW_LATENCY if low_latency is None else low_latency
+        self.early_trigger = early_trigger
+        self.blocksize = config.VOICE_LOW_LATENCY_BLOCKSIZE if self.low_latency else config.VOICE_BLOCKSIZE
+        self.model = get_model("en-us")
         self.samplerate = 16000
-        self.q = queue.Queue()
+        self.q = queue.Queue(maxsize=config.AUDIO_QUEUE_BLOCKS)
+        self.commands = commands if commands is not None else queue.Queue(maxsize=config.COMMAND_QUEUE_SIZE)
+        self._own_consumer = commands is None
         self.listening = False
+        self.muted = threading.Event()
+        self._mutes = 0  # mute() calls not yet undone; the ack and replies overlap
+        self._mute_lock = threading.Lock()
+        self.held = threading.Event()
+        self._reset = threading.Event()
+        self.stream = None
         self.thread = None
+        self.consumer = None
 
     def _audio_callback(self, indata, frames, time, status):
-        self.q.put(bytes(indata))
+        self.feed(bytes(indata))
 
-    def start_listening(self):
+    def feed(self, data: bytes, block=False):
+        # Queue one block of 16 kHz mono int16 audio for recognition. The
+        # input stream calls this; so can anything replaying recorded audio,
+        # with block=True to wait for room instead of dropping old blocks.
+        if self.muted.is_set() or not self.listening:
+            return
+        if block:
+            self.q.put(data)
+            return
+        try:
+            self.q.put_nowait(data)
+        except queue.Full:
+            # Recognition is behind; drop the oldest block, not the newest
+            try:
+                self.q.get_nowait()
+            except queue.Empty:
+                pass
+            self.q.put_nowait(data)
+
+    def start_listening(self, capture=True):
+        # capture=False runs recognition without opening the microphone;
+        # audio then has to come in through feed()
+        if self.listening:
+            return
         self.listening = True
+        if capture and self.stream is None:
+            self.stream = sd.RawInputStream(samplerate=self.samplerate, blocksize=self.blocksize, dtype='int16', channels=1, callback=self._audio_callback)
+            self.stream.start()
         self.thread = threading.Thread(target=self._listen_loop, daemon=True)
         self.thread.start()
+        if self._own_consumer and self.on_command:
+            self.consumer = threading.Thread(target=self._consume_loop, daemon=True)
+            self.consumer.start()
 
     def stop_listening(self):
         self.listening = False
-        if self.thread:
-            self.thread.join()
+        current = threading.current_thread()
+        for thread in (self.thread, self.consumer):
+            if thread and thread is not current:
+                thread.join()
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+    def mute(self):
+        with self._mute_lock:
+            self._mutes += 1
+            self.muted.set()
+        # Throw away anything captured before muting and start the next
+        # utterance from a clean recognizer state
+        while True:
+            try:
+                self.q.get_nowait()
+            except queue.Empty:
+                break
+        self._reset.set()
+
+    def unmute(self):
+        with self._mute_lock:
+            self._mutes = max(0, self._mutes - 1)
+            if not self._mutes:
+                self.muted.clear()
+
+    def hold(self):
+        self.held.set()
+
+    def release(self):
+        self.held.clear()
+        self._reset.set()
+
+    def _emit(self, text, decode=0.0):
+        print(f"[TOVA] Heard: {text}")
+        # Time spent inside Vosk on this utterance; joins the command's trace
+        tracing.handoff(text, 'asr.decode', decode)
+        if self.on_heard:
+            self.on_heard(text)
+        if self.held.is_set():
+            print(f"[TOVA] Interrupted by: {text}")
+            return
+        try:
+            self.commands.put_nowait(text)
+        except queue.Full:
+            print(f"[TOVA] Busy, dropped command: {text}")
+
+    def _recognizer(self):
+        return vosk.KaldiRecognizer(self.model, self.samplerate)
+
+    def _wake_recognizer(self):
+        return vosk.KaldiRecognizer(self.model, self.samplerate, json.dumps([self.wake_word, "[unk]"]))
+
+    def _has_wake_word(self, text):
+        return f" {self.wake_word} " in f" {text} "
+
+    def _wake(self):
+        print("[TOVA] Wake word heard.")
+        if self.on_wake:
+            self.on_wake()
+        return self._recognizer(), time.monotonic() + config.WAKE_TIMEOUT
 
     def _listen_loop(self):
-        rec = vosk.KaldiRecognizer(self.model, self.samplerate)
+        gated = bool(self.wake_word)
+        waiting = gated
+        rec = self._wake_recognizer() if gated else self._recognizer()
+        awake_until = 0.0
+        partial, partial_since = '', 0.0
+        emitted = False  # The utterance in progress was already sent early
+        decode = 0.0
+        stable = config.VOICE_PARTIAL_STABLE_MS / 1000
         if self.set_avatar_state:
             self.set_avatar_state('listening')
-        print("[TOVA] VoiceListener: Always listening for commands...")
-        with sd.RawInputStream(samplerate=self.samplerate, blocksize = 8000, dtype='int16', channels=1, callback=self._audio_callback):
-            while self.listening:
-                data = self.q.get()
-                if rec.AcceptWaveform(data):
-                    result = json.loads(rec.Result())
-                    text = result.get('text', '').strip()
+        if gated:
+            print(f"[TOVA] VoiceListener: Waiting for wake word '{self.wake_word}'...")
+        else:
+            print("[TOVA] VoiceListener: Always listening for commands...")
+        while self.listening:
+            try:
+                data = self.q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if self._reset.is_set():
+                self._reset.clear()
+                rec.Reset()
+                partial = ''
+                emitted = False
+                decode = 0.0
+            now = time.monotonic()
+            if gated and not waiting and now > awake_until and not json.loads(rec.PartialResult()).get('partial'):
+                # Nothing said after the wake word; go back to the cheap gate
+                waiting, rec, emitted = True, self._wake_recognizer(), False
+                continue
+            started = time.perf_counter()
+            final = rec.AcceptWaveform(data)
+            # Only decoding of the command itself counts, not the wake gate
+            decode = 0.0 if waiting else decode + time.perf_counter() - started
+            if final:
+                text = json.loads(rec.Result()).get('text', '').strip()
+                partial = ''
+                if waiting:
+                    if self._has_wake_word(text):
+                        waiting = False
+                        rec, awake_until = self._wake()
+                elif emitted:
+                    # The end of an utterance that was sent early; the rest
+                    # of it is not a new command
+                    emitted = False
+                    if gated:
+                        waiting, rec = True, self._wake_recognizer()
+                    decode = 0.0
+                else:
+                    if gated:
+                        # The tail of the wake word can spill into the command
+                        text = f" {text} ".replace(f" {self.wake_word} ", " ", 1).strip()
                     if text:
-                        print(f"[TOVA] Heard: {text}")
-                        if self.set_avatar_state:
-                            self.set_avatar_state('thinking')
-                        if self.on_command:
-                            self.on_command(text)
-                        if self.set_avatar_state:
-                            self.set_avatar_state('listening') 
\ No newline at end of file
+                        self._emit(text, decode)
+                        if gated:
+                            waiting, rec = True, self._wake_recognizer()
+                    decode = 0.0
+            elif waiting:
+                heard = json.loads(rec.PartialResult()).get('partial', '')
+                if self._has_wake_word(heard):
+                    waiting = False
+                    rec, awake_until = self._wake()
+            elif self.low_latency and self.early_trigger and not emitted:
+                heard = json.loads(rec.PartialResult()).get('partial', '').strip()
+                if heard != partial:
+                    partial, partial_since = heard, now
+                elif partial and now - partial_since >= stable and self.early_trigger(partial):
+                    self._emit(partial, decode)
+                    # Keep decoding until Vosk ends the utterance, so its
+                    # remainder is dropped rather than heard as a new command
+                    partial, emitted = '', True
+
+    def _consume_loop(self):
+        while self.listening:
+            try:
+                text = self.commands.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if self.set_avatar_state:
+                self.set_avatar_state('thinking')
+            self.on_command(text)
+            if self.set_avatar_state:
+                self.set_avatar_state('listening')